@@ -1,19 +1,153 @@
+import concurrent.futures
+import json
 import sys
-import itertools
+import threading
 
 from PySide6 import QtCore
 from PySide6.QtCore import (QLocale, QSettings)
 from PySide6.QtWidgets import (QApplication, QMainWindow, QMessageBox)
 
-from stirrer import Stirrer
+import stirrer_schedule
+from stirrer import Stirrer, SteppedSweep, DwellScheduler
 
 # Important:
 # You need to run the following command to generate the mainwindow.py file
 #     pyside6-uic mainwindow.ui -o mainwindow.py
 from mainwindow_ui import Ui_MainWindow
 
+
+class StirrerWorker(QtCore.QObject):
+    """
+    Owns all serial traffic to the stirrer.
+
+    The worker lives in its own QThread. The controller state is polled
+    every `interval` ms and changes are reported through signals. The
+    first poll opens the port of a lazy Stirrer, `connectedChanged`
+    tells whether the controller answers.
+    Commands are handed over with `submit` and executed one after
+    another on a command thread, so neither the GUI thread nor the
+    polling waits for long moves and sweeps.
+    """
+    connectedChanged = QtCore.Signal(bool)
+    positionChanged = QtCore.Signal(float)
+    runningChanged = QtCore.Signal(bool)
+    initializedChanged = QtCore.Signal(bool)
+    errorRaised = QtCore.Signal(str)
+    commandFinished = QtCore.Signal(object)
+    _pollRequested = QtCore.Signal()
+    _intervalChanged = QtCore.Signal(int)
+    _shutdownRequested = QtCore.Signal()
+
+    def __init__(self, stirrer, interval=200, parent=None):
+        super(StirrerWorker, self).__init__(parent)
+        self.stirrer = stirrer
+        self.interval = interval
+        self._poll_timer = None
+        self._connected = None
+        self._position = None
+        self._running = None
+        self._initialized = None
+        self._error = None
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='StirrerCommand')
+        self._pollRequested.connect(self.poll)
+        # a lost port is reported at once, polls wait for the reconnection
+        stirrer.on_connection_changed = self._connection_changed
+        self._intervalChanged.connect(self._set_interval)
+        self._shutdownRequested.connect(self._shutdown)
+
+    @QtCore.Slot()
+    def start(self):
+        # the timer has to be created in the worker thread
+        self._poll_timer = QtCore.QTimer(self)
+        self._poll_timer.timeout.connect(self.poll)
+        self._poll_timer.start(self.interval)
+        self.poll()
+
+    def set_interval(self, interval):
+        self._intervalChanged.emit(interval)
+
+    @QtCore.Slot(int)
+    def _set_interval(self, interval):
+        self.interval = interval
+        if self._poll_timer is not None:
+            self._poll_timer.start(interval)
+
+    def shutdown(self):
+        """
+        stop polling, drop queued commands and leave the worker thread
+        once the running command is done
+        """
+        self._shutdownRequested.emit()
+
+    @QtCore.Slot()
+    def _shutdown(self):
+        if self._poll_timer is not None:
+            self._poll_timer.stop()
+            self._poll_timer = None
+        self._executor.shutdown(cancel_futures=True)
+        self.thread().quit()
+
+    def submit(self, command, tag=None):
+        """
+        queue `command` (a callable) for execution on the command thread,
+        `commandFinished` is emitted with `tag` afterwards
+        """
+        self._executor.submit(self._execute, command, tag)
+
+    def _execute(self, command, tag):
+        # runs on the command thread
+        try:
+            command()
+        except Exception as e:
+            self.errorRaised.emit(str(e))
+        self.commandFinished.emit(tag)
+        # poll in the worker thread
+        self._pollRequested.emit()
+
+    def _connection_changed(self, connected):
+        # called from the thread that reconnects
+        if connected != self._connected:
+            self._connected = connected
+            self.connectedChanged.emit(connected)
+
+    @QtCore.Slot()
+    def poll(self):
+        try:
+            running, angle, initialized, error, message = \
+                self.stirrer._status()
+        except Exception as e:
+            # report once, polling goes on trying
+            if self._connected is not False:
+                self._connected = False
+                self.connectedChanged.emit(False)
+                self.errorRaised.emit(str(e))
+            return
+        if not self._connected:
+            self._connected = True
+            self.connectedChanged.emit(True)
+        if angle != self._position:
+            self._position = angle
+            self.positionChanged.emit(angle)
+        if running != self._running:
+            self._running = running
+            self.runningChanged.emit(running)
+        # same semantics as Stirrer.drive_initialized
+        initialized = initialized and not running
+        if initialized != self._initialized:
+            self._initialized = initialized
+            self.initializedChanged.emit(initialized)
+        if error != self._error:
+            self._error = error
+            if error:
+                self.errorRaised.emit(message)
+
+
 class MainWindow(QMainWindow):
-    def __init__(self, settings, parent=None):
+    # index and angle of a sweep position, emitted from the command thread
+    _sweepProgressed = QtCore.Signal(int, float)
+
+    def __init__(self, settings, parent=None, poll_interval=200):
         super(MainWindow, self).__init__(parent)
         self.settings = settings
         self.ui = Ui_MainWindow()
@@ -31,106 +165,249 @@ class MainWindow(QMainWindow):
         self.ui.tunmode_step_cont_pushButton.clicked.connect(self.tunmode_step_cont_clicked)
 
         self.tau = None
-        self.step_iterator = None
+        self.sweep = None
+        self.scheduler = None
+        self.sweep_stop = threading.Event()
+        self.position = None
 
-        self.stirrer = Stirrer()
+        # connected by the first poll of the worker, the window does not
+        # wait for the controller
+        self.stirrer = Stirrer(do_not_open=True)
         self.velocity = 50 # in percent
-        self.is_initialized = self.stirrer.drive_initialized
-        if self.is_initialized:
-            self.ui.init_pushButton.setEnabled(False)
+        self.is_initialized = False
+        # sweep of the last session, offered for resumption once the
+        # drive is initialized
+        self.saved_sweep = None
+        self._sweepProgressed.connect(self._save_sweep_progress)
+        self._restore_setup()
+
+        # all serial communication is done by the worker and its command
+        # thread
+        self.worker = StirrerWorker(self.stirrer, interval=poll_interval)
+        self.worker_thread = QtCore.QThread(self)
+        self.worker.moveToThread(self.worker_thread)
+        self.worker_thread.started.connect(self.worker.start)
+        self.worker.connectedChanged.connect(self._connected_changed)
+        self.worker.positionChanged.connect(self._update_position)
+        self.worker.initializedChanged.connect(self._initialized_changed)
+        self.worker.errorRaised.connect(self._show_error)
+        self.worker.commandFinished.connect(self._command_finished)
+        self.ui.cur_pos_label.setText("connecting...")
+        self.ui.statusbar.showMessage("Connecting to the stirrer...")
+        self.worker_thread.start()
+
+    def _restore_setup(self):
+        settings = self.settings
+        self.ui.velocity_spinBox.setValue(
+            settings.value('velocity', self.velocity, type=int))
+        self.ui.step_doubleSpinBox.setValue(settings.value(
+            'step', self.ui.step_doubleSpinBox.value(), type=float))
+        self.ui.tun_mode_time_doubleSpinBox.setValue(settings.value(
+            'tau', self.ui.tun_mode_time_doubleSpinBox.value(), type=float))
+        if settings.value('clockwise', True, type=bool):
+            self.ui.tunmode_cw_radioButton.setChecked(True)
+        else:
+            self.ui.tunmode_ccw_radioButton.setChecked(True)
+        self.ui.tunmode_shortest_checkBox.setChecked(
+            settings.value('shortest', True, type=bool))
+        self.saved_sweep = self._load_sweep()
+
+    def _save_setup(self):
+        settings = self.settings
+        settings.setValue('velocity', self.ui.velocity_spinBox.value())
+        settings.setValue('step', self.ui.step_doubleSpinBox.value())
+        settings.setValue('tau', self.ui.tun_mode_time_doubleSpinBox.value())
+        settings.setValue('clockwise',
+                          self.ui.tunmode_cw_radioButton.isChecked())
+        settings.setValue('shortest',
+                          self.ui.tunmode_shortest_checkBox.isChecked())
+        if self.is_initialized and self.position is not None:
+            settings.setValue('angle', self.position)
+        settings.sync()
+
+    def _load_sweep(self):
+        settings = self.settings
+        try:
+            angles = json.loads(settings.value('sweep/angles', ''))
+        except ValueError:
+            return None
+        if not angles:
+            return None
+        return {
+            'angles': angles,
+            'index': settings.value('sweep/index', -1, type=int),
+            'direction': settings.value('sweep/direction', 1, type=int),
+            'tau': settings.value('sweep/tau', 1.0, type=float),
+            'angle': settings.value('angle', None)}
 
-        self.curpos_timer = QtCore.QTimer()
-        self.curpos_timer.timeout.connect(self._update_position)
-        self.curpos_timer.start()
+    def _save_sweep(self, angles, direction, tau, index):
+        settings = self.settings
+        settings.setValue('sweep/angles', json.dumps(
+            [float(angle) for angle in angles]))
+        settings.setValue('sweep/direction', direction)
+        settings.setValue('sweep/tau', tau)
+        settings.setValue('sweep/index', index)
+        settings.sync()
+
+    def _clear_sweep(self):
+        self.settings.remove('sweep')
+        self.settings.sync()
+
+    def _save_sweep_progress(self, index, angle):
+        # written at every position, a campaign may end by a crash
+        self.settings.setValue('sweep/index', index)
+        self.settings.setValue('angle', angle)
+        self.settings.sync()
+
+    def _offer_resume(self):
+        saved, self.saved_sweep = self.saved_sweep, None
+        if self.sweep is not None:
+            return
+        angles = saved['angles']
+        index = saved['index']
+        where = f"position {index + 1} of {len(angles)}"
+        if saved['angle'] is not None:
+            where += f" ({float(saved['angle']):.1f} deg)"
+        ret = QMessageBox.question(
+            self, "StirrerRC",
+            f"Resume the interrupted sweep after {where}?",
+            QMessageBox.StandardButton.Yes, QMessageBox.StandardButton.No)
+        if ret == QMessageBox.StandardButton.Yes:
+            self._start_sweep(angles, saved['direction'], saved['tau'], index)
+        else:
+            self._clear_sweep()
+
+    def _connected_changed(self, connected):
+        if connected:
+            self.ui.statusbar.clearMessage()
+            if self.is_initialized and self.position is not None:
+                self.ui.cur_pos_label.setText(str(self.position))
+            else:
+                self.ui.cur_pos_label.setText("???")
+        else:
+            self.ui.cur_pos_label.setText("not connected")
 
     def init_clicked(self):
         self.ui.init_pushButton.setEnabled(False)
-        init_timer = QtCore.QTimer()
-        init_timer.singleShot(10, self.stirrer.initialize_drive)
-        self.wait_for_init_timer = QtCore.QTimer()
-        self.wait_for_init_timer.timeout.connect(self._wait_for_initialization)
-        self.wait_for_init_timer.start()
+        self.worker.submit(self.stirrer.initialize_drive)
 
-    def _wait_for_initialization(self):
-        if self.is_initialized:
-            return
-        if self.stirrer.motor_running:
-            return
-        elif self.stirrer.drive_initialized:
+    def _initialized_changed(self, initialized):
+        if initialized:
             self.is_initialized = True
-            self.wait_for_init_timer.stop()
+            self.ui.init_pushButton.setEnabled(False)
+            if self.position is not None:
+                self.ui.cur_pos_label.setText(str(self.position))
+            if self.saved_sweep is not None:
+                self._offer_resume()
+
+    def _show_error(self, message):
+        self.ui.statusbar.showMessage(message, 5000)
+
+    def _command_finished(self, tag):
+        # sweeps are tagged with their scheduler, an older one may end
+        # after the next was started
+        if tag is not None and tag is self.scheduler:
+            # ended by STOP or an error, a new sweep may be started
+            self.sweep = None
+            stats = self.scheduler.statistics()
+            if stats:
+                self.ui.statusbar.showMessage(
+                    f"{stats['positions']} positions, "
+                    f"mean dwell {stats['dwell_mean']:.3f} s, "
+                    f"jitter {stats['jitter_stdev']*1000:.1f} ms")
 
     def velocity_changed(self):
         self.velocity = self.ui.velocity_spinBox.value()
 
     def stopp_clicked(self):
-        try:
-            self.iter_timer.stop()
-            self.iter_timer = None
-        except AttributeError:
-            pass
-        self.stirrer.stop_motor()
+        self.sweep = None
+        self.sweep_stop.set()
+        # STOP must not queue behind a running worker command, the
+        # driver sends it ahead of everything else and cancels the waits
+        threading.Thread(target=self.stirrer.stop_motor, daemon=True).start()
 
-    def _update_position(self):
+    def _update_position(self, pos):
+        self.position = pos
         if self.is_initialized:
-            pos = self.stirrer.current_angle
-             # print(pos)
             self.ui.cur_pos_label.setText(str(pos))
 
     def stirrmode_start_clicked(self):
         if self.is_initialized:
             vel = self.ui.velocity_spinBox.value()   # currently ignored
             if self.ui.stirrmode_cw_radioButton.isChecked():
-                self.stirrer.run_clockwise()
+                self.worker.submit(self.stirrer.run_clockwise)
             else:
-                self.stirrer.run_anti_clockwise()
+                self.worker.submit(self.stirrer.run_anti_clockwise)
 
     def tunmode_step_once_clicked(self):
         if self.is_initialized:
             step = self.ui.step_doubleSpinBox.value()
             vel = self.ui.velocity_spinBox.value()
             if self.ui.tunmode_cw_radioButton.isChecked():
-                self.stirrer.step_clockwise_by(step)
+                self.worker.submit(lambda: self.stirrer.step_clockwise_by(step))
             else:
-                self.stirrer.step_anti_clockwise_by(step)
+                self.worker.submit(
+                    lambda: self.stirrer.step_anti_clockwise_by(step))
 
     def tunmode_step_cont_clicked(self):
+        if self.sweep is not None:
+            # one sweep at a time, STOP ends the running one
+            self.ui.statusbar.showMessage(
+                "A sweep is running, press STOP first", 5000)
+            return
         step = self.ui.step_doubleSpinBox.value()
-        self.tau = self.ui.tun_mode_time_doubleSpinBox.value()
-        cpos = self.stirrer.current_angle
-        ang_list = []
-        pm = 1 if self.ui.tunmode_cw_radioButton.isChecked() else -1  # +/- for cw/ccw
-        number = int(round(360.0/step, 0)) + 1
-        for i in range(1, number):
-            npos = self.stirrer._clip_angle(cpos+(i*pm*step))
-            ang_list.append(npos)
-        self.step_iterator = itertools.cycle(ang_list)
-        self.iter_timer = QtCore.QTimer()
-        self._goto_next_position()
+        tau = self.ui.tun_mode_time_doubleSpinBox.value()
+        cpos = self.position
+        if cpos is None:
+            return
+        direction = 1 if self.ui.tunmode_cw_radioButton.isChecked() else 0
+        angles = stirrer_schedule.uniform(
+            step, start=cpos, direction=direction)
+        self._start_sweep(angles, direction, tau)
+
+    def _start_sweep(self, angles, direction, tau, index=-1):
+        """
+        sweep through `angles` continuing after position `index`
+        """
+        self.tau = tau
+        self.saved_sweep = None
+        self._save_sweep(angles, direction, tau, index)
+        self.sweep = SteppedSweep(
+            self.stirrer, angles, direction=direction, cycle=True)
+        self.sweep.index = index
+        self.scheduler = scheduler = DwellScheduler(self.sweep, self.tau)
+        self.sweep_stop = stop = threading.Event()
+        # runs on the command thread, positions are reported by callback
+        self.worker.submit(
+            lambda: scheduler.run(
+                on_position=self._sweep_position, stop_event=stop),
+            scheduler)
         return
 
-    def _goto_next_position(self):
-        if self.stirrer.motor_running:
-            self.iter_timer.singleShot(100, self._goto_next_position)
-            return
-        next = self.step_iterator.__next__()
-        self.stirrer.goto_angle(next)
-        self.stirrer._wait()
-        self._update_position()
-        try:
-            self.iter_timer.singleShot(self.tau*1000, self._goto_next_position)
-        except AttributeError:
-            pass
+    def _sweep_position(self, index, angle, settled):
+        # called on the command thread
+        self.worker.positionChanged.emit(angle)
+        self._sweepProgressed.emit(index, angle)
 
     def tun_mode_abs_go_clicked(self):
         if self.is_initialized:
             pos = self.ui.tunmode_abs_pos_doubleSpinBox.value()
-            if self.ui.tunmode_cw_radioButton.isChecked():
+            if self.ui.tunmode_shortest_checkBox.isChecked():
+                direction = None
+            elif self.ui.tunmode_cw_radioButton.isChecked():
                 direction = 1
             else:
                 direction = 0
-            self.stirrer.goto_angle(pos, direction=direction)
+            self.worker.submit(
+                lambda: self.stirrer.goto_angle(pos, direction=direction))
+
 
+    def _stop_on_exit(self):
+        try:
+            self.stirrer.stop_motor()
+        except Exception as e:
+            # the controller may be absent
+            print(f"Could not stop the stirrer: {e}")
 
     def closeEvent(self, event):
         # fire confirmation box
@@ -138,8 +415,17 @@ class MainWindow(QMainWindow):
                                        "Do you want to exit the application?",
                                            QMessageBox.StandardButton.Yes, QMessageBox.StandardButton.No)
         if ret == QMessageBox.StandardButton.Yes:
-            # self._save_setup()
-            self.stirrer.stop_motor()
+            self._save_setup()
+            self.sweep = None
+            self.sweep_stop.set()
+            # STOP first, it ends a running command of the worker
+            stop = threading.Thread(target=self._stop_on_exit, daemon=True)
+            stop.start()
+            stop.join(self.stirrer._query_timeout + 1)
+            self.worker.shutdown()
+            # fails pending queries and reconnection attempts at once
+            self.stirrer.close()
+            self.worker_thread.wait()
             event.accept()
         else:
             event.ignore()
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+import asyncio
+import time
+
+import serial_asyncio
+
+from stirrer import (Stirrer, AngleError, MotionStoppedError,
+                     StirrerLockedError, parse_status, angle_deviation,
+                     shortest_direction, travel_distance, travel_time)
+
+
+class AsyncStirrer(object):
+    """
+    asyncio version of Stirrer.
+
+    The serial port is driven through pyserial-asyncio, so waiting for
+    answers and for the motor never blocks the event loop. The protocol
+    parsing and the motion model are shared with Stirrer.
+    """
+    read_termination = Stirrer.read_termination
+    write_termination = Stirrer.write_termination
+
+    _status_query_delay = Stirrer._status_query_delay
+    _query_timeout = Stirrer._query_timeout
+    _angle_error = Stirrer._angle_error
+    _inter_cmd_wait_time = Stirrer._inter_cmd_wait_time
+    _settle_margin = Stirrer._settle_margin
+    _confirm_interval = Stirrer._confirm_interval
+    _move_timeout_factor = Stirrer._move_timeout_factor
+    _move_timeout_margin = Stirrer._move_timeout_margin
+    _timeout = Stirrer._timeout
+
+    def __init__(
+            self,
+            port_parameters=None,
+            status_retries=10,
+            stirrer_parameters=None):
+        if port_parameters is None:
+            port_parameters = {}
+        if stirrer_parameters is None:
+            stirrer_parameters = {}
+        self.status_retries = status_retries
+        self.port_parameters = port_parameters
+        self.stirrer_parameters = {
+            **Stirrer.stirrer_parameters,
+            **stirrer_parameters}
+        self.reader = None
+        self.writer = None
+        self._lock = None
+        self._direction = None
+        # predicted move: (target, start time, duration)
+        self._move = None
+        # an answer that timed out or was unusable may still arrive
+        self._reply_pending = False
+        # counts STOP commands, a move started before one is cancelled
+        self._stop_count = 0
+
+    async def open(self):
+        parameters = {**Stirrer.default_port_parameters,
+                      **self.port_parameters}
+        url = parameters.pop('port')
+        # the transport reads non-blocking on its own
+        parameters.pop('timeout', None)
+        self.reader, self.writer = \
+            await serial_asyncio.open_serial_connection(
+                url=url, **parameters)
+        self._lock = asyncio.Lock()
+        await self.status()
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _write(self, command):
+        if command not in Stirrer._query_commands:
+            self._move = None
+        if command.startswith('DIR:'):
+            self._direction = int(command[4:])
+        elif command == 'INIT':
+            self._direction = None
+        self.writer.write(f"{command}{self.write_termination}".encode())
+        await self.writer.drain()
+
+    def _discard_input(self):
+        # drop a late answer, read by the transport or still in the port
+        self.writer.transport.serial.reset_input_buffer()
+        # StreamReader has no public way to empty its buffer
+        self.reader._buffer.clear()
+        self._reply_pending = False
+
+    async def _query_frame(self, command):
+        # the raw answer including the termination, b'' on timeout
+        termination = self.read_termination.encode()
+        async with self._lock:
+            if self._reply_pending:
+                self._discard_input()
+            await self._write(command)
+            try:
+                return await asyncio.wait_for(
+                    self.reader.readuntil(termination),
+                    self._query_timeout)
+            except asyncio.IncompleteReadError as e:
+                self._reply_pending = True
+                return e.partial
+            except asyncio.TimeoutError:
+                self._reply_pending = True
+                return b''
+
+    async def _query(self, command):
+        termination = self.read_termination.encode()
+        answer = await self._query_frame(command)
+        if answer.endswith(termination):
+            answer = answer[:-len(termination)]
+        return answer.decode()
+
+    async def status(self):
+        """
+        query the controller, returns (motor_running, current_angle,
+        drive_initialized, error, error_message)
+        """
+        termination = self.read_termination.encode()
+        answer = None
+        for attempt in range(self.status_retries):
+            answer = await self._query_frame('?')
+            record = None
+            if answer.endswith(termination):
+                record = parse_status(
+                    answer, 0, len(answer) - len(termination))
+            if record is None:
+                if b"is locked" in answer:
+                    raise StirrerLockedError()
+                self._reply_pending = True
+                await asyncio.sleep(self._status_query_delay)
+                continue
+            (self._motor_running,
+             self._current_angle,
+             self._drive_initialized,
+             self._error) = record
+            self._error_message = ""
+            if self._error:
+                try:
+                    self._error_message = await self._query('ERREAD')
+                except UnicodeDecodeError:
+                    print("WARNING: could not decode error message")
+            return (
+                self._motor_running,
+                self._current_angle,
+                self._drive_initialized,
+                self._error,
+                self._error_message
+            )
+        raise Exception(
+            f"Current Stirrer State could not be queried, "
+            f"Received: \"{answer}\"")
+
+    async def current_angle(self):
+        return (await self.status())[1]
+
+    async def motor_running(self):
+        return (await self.status())[0]
+
+    async def initialize_drive(self):
+        running, angle, initialized = (await self.status())[:3]
+        if running or not initialized:
+            await self._write('INIT')
+            await self.wait_settled()
+            running, angle, initialized = (await self.status())[:3]
+        return initialized and not running
+
+    async def goto_angle(self, angle, direction=None):
+        """
+        start a move, direction = 1 -> clockwise, None -> the shorter way,
+        await wait_settled() to wait for the arrival.
+        Raises MotionStoppedError if stop() is called before the move
+        was sent.
+        """
+        stops = self._stop_count
+        start = await self.current_angle()
+        if direction is None:
+            direction = shortest_direction(
+                start, abs(int(angle % 360)),
+                1 if self._direction is None else self._direction)
+        direction = 1 if direction == 1 else 0
+        target = abs(int(angle % 360))
+        parameters = self.stirrer_parameters
+        duration = travel_time(
+            travel_distance(start, target, direction),
+            parameters['maxspeed'],
+            parameters['minspeed'],
+            parameters['acc'])
+        # no other command may come between DIR and RMA
+        async with self._lock:
+            if self._direction != direction:
+                await self._write(f'DIR:{direction}')
+                await asyncio.sleep(self._inter_cmd_wait_time)
+            # stop() does not wait for the lock, it may have come between
+            if self._stop_count != stops:
+                raise MotionStoppedError()
+            await self._write(f'RMA:{target}')
+            if self._stop_count == stops:
+                self._move = (target, time.monotonic(), duration)
+
+    async def wait_settled(self):
+        """
+        wait until the motor stopped, returns the current angle
+        and raises AngleError if the target of a move was missed
+        """
+        if self._move is None:
+            # no prediction available, poll with the fixed interval
+            arrival = None
+            deadline = time.monotonic() + self._timeout
+            interval = self._status_query_delay
+            await asyncio.sleep(interval)
+        else:
+            target, started, duration = self._move
+            arrival = started + duration
+            deadline = (started + duration * self._move_timeout_factor
+                        + self._move_timeout_margin)
+            interval = self._confirm_interval
+            await asyncio.sleep(max(
+                arrival - time.monotonic() - self._settle_margin,
+                interval))
+        while True:
+            running, angle = (await self.status())[:2]
+            now = time.monotonic()
+            if not running:
+                if arrival is None or now >= arrival:
+                    break
+                if angle_deviation(angle, target) <= self._angle_error:
+                    break
+            if now >= deadline:
+                print("Waiting for motor to finish movement timed out.")
+                break
+            await asyncio.sleep(interval)
+        if arrival is not None:
+            self._move = None
+            if angle_deviation(angle, target) > self._angle_error:
+                raise AngleError(target, angle, self._angle_error)
+        return angle
+
+    async def stop(self):
+        self._stop_count += 1
+        await self._write('STOP')
+        await self.wait_settled()
+        return await self.motor_running()
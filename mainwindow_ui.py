@@ -16,11 +16,12 @@ from PySide6.QtGui import (QAction, QBrush, QColor, QConicalGradient,
     QIcon, QImage, QKeySequence, QLinearGradient,
     QPainter, QPalette, QPixmap, QRadialGradient,
     QTransform)
-from PySide6.QtWidgets import (QApplication, QDoubleSpinBox, QFormLayout, QFrame,
-    QGridLayout, QGroupBox, QHBoxLayout, QLabel,
-    QMainWindow, QMenu, QMenuBar, QPushButton,
-    QRadioButton, QSizePolicy, QSpacerItem, QSpinBox,
-    QStatusBar, QTabWidget, QVBoxLayout, QWidget)
+from PySide6.QtWidgets import (QApplication, QCheckBox, QDoubleSpinBox, QFormLayout,
+    QFrame, QGridLayout, QGroupBox, QHBoxLayout,
+    QLabel, QMainWindow, QMenu, QMenuBar,
+    QPushButton, QRadioButton, QSizePolicy, QSpacerItem,
+    QSpinBox, QStatusBar, QTabWidget, QVBoxLayout,
+    QWidget)
 
 class Ui_MainWindow(object):
     def setupUi(self, MainWindow):
@@ -114,6 +115,12 @@ class Ui_MainWindow(object):
 
         self.formLayout_2.setWidget(1, QFormLayout.FieldRole, self.tun_mode_abs_go_pushButton)
 
+        self.tunmode_shortest_checkBox = QCheckBox(self.groupBox_5)
+        self.tunmode_shortest_checkBox.setObjectName(u"tunmode_shortest_checkBox")
+        self.tunmode_shortest_checkBox.setChecked(True)
+
+        self.formLayout_2.setWidget(1, QFormLayout.LabelRole, self.tunmode_shortest_checkBox)
+
         self.label_3 = QLabel(self.groupBox_5)
         self.label_3.setObjectName(u"label_3")
 
@@ -312,6 +319,7 @@ class Ui_MainWindow(object):
         self.tunmode_ccw_radioButton.setText(QCoreApplication.translate("MainWindow", u"Counter Clockwise", None))
         self.groupBox_5.setTitle(QCoreApplication.translate("MainWindow", u"Absolute Operation", None))
         self.tun_mode_abs_go_pushButton.setText(QCoreApplication.translate("MainWindow", u"Go", None))
+        self.tunmode_shortest_checkBox.setText(QCoreApplication.translate("MainWindow", u"Shortest Path", None))
         self.label_3.setText(QCoreApplication.translate("MainWindow", u"Angle:", None))
         self.groupBox_2.setTitle(QCoreApplication.translate("MainWindow", u"Relative Operation", None))
         self.label.setText(QCoreApplication.translate("MainWindow", u"Step:", None))
@@ -1,7 +1,291 @@
 #!/usr/bin/env python3
+import contextlib
+import heapq
+import itertools
+import math
+import statistics
+import threading
 import time
 import serial
 
+from stirrer_metrics import Metrics
+
+# raised by the port when the connection is lost, e.g. by an unplugged
+# USB-serial adapter
+try:
+    import termios
+    _CONNECTION_ERRORS = (serial.SerialException, OSError, termios.error)
+except ImportError:
+    _CONNECTION_ERRORS = (serial.SerialException, OSError)
+
+
+class StatusRecord(object):
+    """
+    the four fields of an answer to '?'
+    """
+    __slots__ = ('motor_running', 'current_angle', 'drive_initialized',
+                 'error')
+
+    def __init__(self, motor_running, current_angle, drive_initialized,
+                 error):
+        self.motor_running = motor_running
+        self.current_angle = current_angle
+        self.drive_initialized = drive_initialized
+        self.error = error
+
+    def __iter__(self):
+        yield self.motor_running
+        yield self.current_angle
+        yield self.drive_initialized
+        yield self.error
+
+    def __repr__(self):
+        return (f"StatusRecord(motor_running={self.motor_running}, "
+                f"current_angle={self.current_angle}, "
+                f"drive_initialized={self.drive_initialized}, "
+                f"error={self.error})")
+
+
+_FLAGS = b'01'
+_ZERO, _ONE = b'0'[0], b'1'[0]
+_ANGLE_CHARACTERS = b'0123456789.+- '
+
+
+def parse_status(frame, start=0, end=None):
+    """
+    Parse the answer to '?' in frame[start:end] (bytes or bytearray, without
+    termination) into a StatusRecord in a single pass.
+
+    Returns None for the lock message and for incomplete or garbled
+    answers.
+    """
+    if end is None:
+        end = len(frame)
+    first = frame.find(b',', start, end)
+    second = frame.find(b',', first + 1, end)
+    third = frame.find(b',', second + 1, end)
+    if (first != start + 1 or second < 0
+            or third != second + 2 or end != third + 2):
+        return None
+    running = frame[start]
+    initialized = frame[second + 1]
+    error = frame[third + 1]
+    if (running not in _FLAGS or initialized not in _FLAGS
+            or error not in _FLAGS):
+        return None
+    angle = frame[first + 1:second]
+    if not angle or angle.translate(None, _ANGLE_CHARACTERS):
+        return None
+    try:
+        angle = float(angle)
+    except ValueError:
+        # e.g. misplaced signs
+        return None
+    return StatusRecord(
+        running == _ZERO, angle, initialized == _ZERO, error == _ONE)
+
+
+class FrameDecoder(object):
+    """
+    Splits the received byte stream into frames on one reusable bytearray.
+
+    `feed` appends data, `find` returns the end of the first complete
+    frame (or -1), the frame is then buffer[:end] and is removed with
+    `consume` or `pop`.
+    """
+
+    def __init__(self, termination):
+        self.termination = termination
+        self.buffer = bytearray()
+        # the termination is not in buffer[:_searched]
+        self._searched = 0
+
+    def feed(self, data):
+        self.buffer += data
+
+    def find(self):
+        end = self.buffer.find(self.termination, self._searched)
+        if end < 0:
+            self._searched = max(
+                len(self.buffer) - len(self.termination) + 1, 0)
+        return end
+
+    def consume(self, end):
+        del self.buffer[:end + len(self.termination)]
+        self._searched = 0
+
+    def pop(self, end):
+        frame = bytes(self.buffer[:end])
+        self.consume(end)
+        return frame
+
+    def clear(self):
+        self.buffer.clear()
+        self._searched = 0
+
+
+def angle_deviation(angle, target):
+    """
+    smallest distance in degree between two angles
+    """
+    deviation = abs(angle - target) % 360
+    return min(deviation, 360 - deviation)
+
+
+def travel_distance(start, target, direction):
+    """
+    angle in degree travelled from `start` to `target`,
+    direction = 1 -> clockwise (increasing angle)
+    """
+    if direction == 1:
+        return (target - start) % 360
+    return (start - target) % 360
+
+
+def travel_time(distance, maxspeed, minspeed, acc):
+    """
+    Duration in s of a trapezoidal move over `distance` degree that starts
+    and stops at `minspeed`. Speeds are in rpm, `acc` is in degree/s^2.
+    """
+    if distance <= 0:
+        return 0.0
+    vmax = maxspeed * 6  # rpm -> degree/s
+    vmin = minspeed * 6
+    ramp_time = (vmax - vmin) / acc
+    ramp_distance = (vmax + vmin) / 2 * ramp_time
+    if 2 * ramp_distance >= distance:
+        # triangular profile, maxspeed is not reached
+        return 2 * (math.sqrt(vmin**2 + acc * distance) - vmin) / acc
+    return 2 * ramp_time + (distance - 2 * ramp_distance) / vmax
+
+
+def shortest_direction(start, target, preferred=1):
+    """
+    direction (1 -> clockwise) of the shorter way from `start` to
+    `target`, `preferred` if both ways are equally long
+    """
+    clockwise = travel_distance(start, target, 1)
+    anti_clockwise = travel_distance(start, target, 0)
+    if clockwise == anti_clockwise:
+        return preferred
+    return 1 if clockwise < anti_clockwise else 0
+
+
+def plan_route(start, angles, direction=None, leg_time=None):
+    """
+    Order `angles` for the shortest total travel time from `start`,
+    returns a list of (angle, direction).
+
+    With a fixed `direction` the angles are visited within one turn.
+    Otherwise the route covers the cheapest arc holding all angles and
+    turns back once at most. `leg_time(distance)` is the duration of a
+    single move, by default the distance itself. The route is optimal
+    for leg times linear in the distance, e.g. moves reaching maxspeed.
+    """
+    if leg_time is None:
+        leg_time = float
+    angles = [angle % 360 for angle in angles]
+    if direction is not None:
+        angles.sort(key=lambda angle: travel_distance(start, angle, direction))
+        return [(angle, direction) for angle in angles]
+    points = sorted((travel_distance(start, angle, 1), angle)
+                    for angle in angles)
+    route = [(angle, 1) for offset, angle in points if offset == 0]
+    points = [point for point in points if point[0] > 0]
+    n = len(points)
+    if not n:
+        return route
+    # clockwise offsets from start, the start itself is 0 and 360
+    offsets = [0.0] + [offset for offset, angle in points] + [360.0]
+    # cw[i]: time from start clockwise via point 1 to point i
+    cw = [0.0] * (n + 1)
+    for i in range(1, n + 1):
+        cw[i] = cw[i - 1] + leg_time(offsets[i] - offsets[i - 1])
+    # ccw[i]: time from start anti-clockwise via point n to point i
+    ccw = [0.0] * (n + 2)
+    for i in range(n, 0, -1):
+        ccw[i] = ccw[i + 1] + leg_time(offsets[i + 1] - offsets[i])
+    # points 1..k are reached clockwise, k+1..n anti-clockwise
+    best = (cw[n], n, 1)
+    best = min(best, (ccw[1], 0, 0))
+    for k in range(1, n):
+        best = min(
+            best,
+            (cw[k] + leg_time(offsets[k] + 360 - offsets[n])
+             + ccw[k + 1] - ccw[n], k, 1),
+            (ccw[k + 1] + leg_time(360 - offsets[k + 1] + offsets[1])
+             + cw[k] - cw[1], k, 0))
+    duration, k, first = best
+    clockwise = [(points[i][1], 1) for i in range(k)]
+    anti_clockwise = [(points[i][1], 0) for i in range(n - 1, k - 1, -1)]
+    if first == 1:
+        return route + clockwise + anti_clockwise
+    return route + anti_clockwise + clockwise
+
+# transaction priorities, lower values are served first
+PRIORITY_STOP = 0
+PRIORITY_COMMAND = 1
+PRIORITY_STATUS = 2
+
+
+class _Transactions(object):
+    """
+    Reentrant lock around the serial port that serves waiting threads
+    by priority and, within a priority, in the order of their requests.
+
+    A thread holding the port may nest transactions, e.g. to send DIR
+    and RMA without another command in between.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._queue = []
+        self._requests = itertools.count()
+        self._owner = None
+        self._depth = 0
+
+    def acquire(self, priority=PRIORITY_COMMAND):
+        me = threading.get_ident()
+        with self._condition:
+            if self._owner == me:
+                self._depth += 1
+                return
+            request = (priority, next(self._requests))
+            heapq.heappush(self._queue, request)
+            while self._owner is not None or self._queue[0] != request:
+                self._condition.wait()
+            heapq.heappop(self._queue)
+            self._owner = me
+            self._depth = 1
+
+    def held(self):
+        """
+        whether the calling thread holds the port
+        """
+        return self._owner == threading.get_ident()
+
+    def release(self):
+        with self._condition:
+            self._depth -= 1
+            if self._depth == 0:
+                self._owner = None
+                self._condition.notify_all()
+
+    @contextlib.contextmanager
+    def request(self, priority):
+        self.acquire(priority)
+        try:
+            yield self
+        finally:
+            self.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
 
 class Stirrer(object):
     """
@@ -13,8 +297,29 @@ class Stirrer(object):
     _timeout = 20
     # delay between query calls
     _status_query_delay = 0.3
+    # maximum time to wait for a complete answer
+    _query_timeout = 2  # in seconds
     _angle_error = 0.5
     _inter_cmd_wait_time = 0.05  # in seconds
+    # waits for a predicted move sleep until _settle_margin before the
+    # arrival and then poll every _confirm_interval
+    _settle_margin = 0.1  # in seconds
+    _confirm_interval = 0.05  # in seconds
+    # a predicted move times out after duration * factor + margin
+    _move_timeout_factor = 1.5
+    _move_timeout_margin = 1.0  # in seconds
+    # status snapshots younger than this are reused by the properties
+    default_status_ttl = 0.1  # in seconds
+    # a lost port is reopened after _reconnect_delay, doubled after every
+    # failed attempt up to _reconnect_max_delay, for _reconnect_timeout
+    _reconnect_delay = 0.5  # in seconds
+    _reconnect_max_delay = 10  # in seconds
+    _reconnect_timeout = 300  # in seconds
+
+    # commands answered by the controller, they do not change its state
+    _query_commands = ('?', 'ERREAD')
+    # commands that set up a move without starting it
+    _setup_commands = ('DIR', 'DEG')
 
     lock_message = ("STIRRER Controller V1.50 is locked. "
                     "Please check SYNC position and restart the controller!")
@@ -29,9 +334,11 @@ class Stirrer(object):
         'rtscts': False,
         'dsrdtr': False,
         'inter_byte_timeout': None,
+        # read granularity only, _read waits up to _query_timeout
+        'timeout': 0.1,
         'exclusive': False}
 
-    # currently these values are ignored
+    # used by the motion model, speeds in rpm, acc in degree/s^2
     stirrer_parameters = {
         'maxspeed': 6,
         'minspeed': 0.18,
@@ -42,47 +349,280 @@ class Stirrer(object):
             self,
             port_parameters=None,
             status_retries=10,
-            do_not_open=False):
+            do_not_open=False,
+            status_ttl=None,
+            stirrer_parameters=None,
+            metrics=None,
+            recorder=None,
+            port=None):
         if port_parameters is None:
             port_parameters = {}
+        if stirrer_parameters is None:
+            stirrer_parameters = {}
+        if status_ttl is None:
+            status_ttl = Stirrer.default_status_ttl
         self.status_retries = status_retries
         self.port_parameters = port_parameters
-        self._create_serial_port()
-        if not do_not_open:
-            self._status()
+        self.status_ttl = status_ttl
+        # see stirrer_metrics, e.g. print(stirrer.metrics.export())
+        self.metrics = Metrics() if metrics is None else metrics
+        # optional stirrer_trace.TrafficRecorder
+        self.recorder = recorder
+        # an open serial-like object used instead of port_parameters,
+        # e.g. a stirrer_trace.ReplayTransport
+        self._port = port
+        self.stirrer_parameters = {
+            **Stirrer.stirrer_parameters,
+            **stirrer_parameters}
+        self._decoder = FrameDecoder(self.read_termination.encode())
+        # an answer may still arrive, see _write_batch
+        self._reply_pending = False
+        self._direction = None
+        # predicted move: (target, start time, duration)
+        self._move = None
+        # all port access goes through this lock, see _Transactions
+        self._transactions = _Transactions()
+        # counts STOP commands, waits for older commands are cancelled
+        self._stop_condition = threading.Condition()
+        self._stop_count = 0
+        self._generation = 0
+        # seconds from the stop_motor call until STOP was sent
+        self.last_stop_latency = None
+        self._status_time = None
+        self._status_snapshot = None
+        # angle of the stopped motor, valid until a command may move it
+        self._stopped_angle = None
         self.next_angle = None
+        # with do_not_open the port is opened by the first command
+        self.port = None
+        # number of times the port was reopened after a lost connection
+        self._reconnects = 0
+        # set by close(), a closed port is only reopened by connect()
+        self._closed = False
+        # called with False when the connection is lost and with True
+        # once it is reopened, from the thread that reconnects
+        self.on_connection_changed = None
+        if not do_not_open:
+            self.connect()
+
+    def connect(self):
+        """
+        open the port unless it is open already and query the status
+        """
+        with self._transactions:
+            self._closed = False
+            if self.port is None or not self.port.is_open:
+                self._create_serial_port()
+        # outside the transaction, so the query gets all its retries
+        return self._status(force=True)
+
+    @property
+    def connected(self):
+        return self.port is not None and self.port.is_open
 
     def _create_serial_port(self):
-        self.port = serial.Serial(
-            **{**Stirrer.default_port_parameters,
-               **self.port_parameters})
-
-    def _write(self, command):
-        self.port.reset_input_buffer()
-        self.port.reset_output_buffer()
-        bytes_written = self.port.write(
-            f"{command}{self.write_termination}".encode())
-        self.port.flush()
+        if self._port is not None:
+            if not self._port.is_open:
+                self._port.open()
+            self.port = self._port
+            return
+        parameters = {**Stirrer.default_port_parameters,
+                      **self.port_parameters}
+        # besides device names this accepts URLs, e.g. socket://host:port
+        self.port = serial.serial_for_url(parameters.pop('port'),
+                                          **parameters)
+
+    def _write(self, command, priority=PRIORITY_COMMAND):
+        return self._write_batch((command,), priority)
+
+    def _write_batch(self, commands, priority=PRIORITY_COMMAND):
+        """
+        Send a command sequence, e.g. ('DIR:1', 'RMA:90'), in one
+        transaction. The commands follow each other with a gap of
+        _inter_cmd_wait_time after the previous one was transmitted, for
+        a gap of 0 the whole sequence goes out in a single write.
+        """
+        with self._transactions.request(priority):
+            if self.port is None:
+                self._create_serial_port()
+            # every command may change the state of the controller
+            self._status_time = None
+            for command in commands:
+                if command not in self._query_commands:
+                    self._move = None
+                    self._generation = self._stop_count
+                    if command.split(':')[0] not in self._setup_commands:
+                        self._stopped_angle = None
+                self.metrics.count('commands', command=command.split(':')[0])
+                if command.startswith('DIR:'):
+                    self._direction = int(command[4:])
+                elif command == 'INIT':
+                    # homing may change the direction
+                    self._direction = None
+            while True:
+                try:
+                    return self._send(commands)
+                except _CONNECTION_ERRORS as e:
+                    self._reconnect(e)
+                # the batch may be lost, send it again on the new port
+                if 'INIT' in commands and self._homing_started():
+                    # homing goes on or is done, do not restart it
+                    commands = tuple(
+                        command for command in commands
+                        if command != 'INIT')
+
+    def _send(self, commands):
+        # stale bytes only remain after an incomplete or unusable
+        # answer, otherwise the input buffer is empty already
+        if self._reply_pending or self._decoder.buffer:
+            self.port.reset_input_buffer()
+            self._decoder.clear()
+            self._reply_pending = False
+        termination = self.write_termination
+        if self._inter_cmd_wait_time > 0:
+            frames = [f"{command}{termination}".encode()
+                      for command in commands]
+        else:
+            frames = [''.join(f"{command}{termination}"
+                              for command in commands).encode()]
+        bytes_written = 0
+        sent = None
+        for data in frames:
+            if sent is not None:
+                self._sleep(max(self._inter_cmd_wait_time
+                                - (time.monotonic() - sent), 0))
+            bytes_written += self.port.write(data)
+            self.port.flush()
+            sent = time.monotonic()
+            if self.recorder is not None:
+                self.recorder.record(b'W', data)
         return bytes_written
 
-    def _read(self, size):
-        answer = self.port.read_until(
-            expected=self.read_termination.encode(),
-            size=size)
-        # drop the carriage return
-        return answer.decode()[:-len(self.read_termination)]
+    def _reconnect(self, error):
+        """
+        Reopen the port after a lost connection, retrying with growing
+        delays. Raises `error` if the port can not be reopened within
+        _reconnect_timeout s, the next command tries again then.
+        """
+        if self._closed:
+            raise error
+        print(f"Connection to the stirrer lost: {error}")
+        self.metrics.count('reconnects')
+        if self.on_connection_changed is not None:
+            self.on_connection_changed(False)
+        try:
+            self.port.close()
+        except _CONNECTION_ERRORS:
+            pass
+        self.port = None
+        self._decoder.clear()
+        self._reply_pending = False
+        self._status_time = None
+        self._stopped_angle = None
+        # the controller may have been restarted meanwhile
+        self._direction = None
+        deadline = time.monotonic() + self._reconnect_timeout
+        delay = self._reconnect_delay
+        while True:
+            self._sleep(delay)
+            if self._closed:
+                # given up by close() meanwhile
+                raise error
+            try:
+                self._create_serial_port()
+                break
+            except _CONNECTION_ERRORS:
+                if time.monotonic() + delay >= deadline:
+                    raise error
+                delay = min(2 * delay, self._reconnect_max_delay)
+        self._reconnects += 1
+        print("Reconnected to the stirrer")
+        if self.on_connection_changed is not None:
+            self.on_connection_changed(True)
+
+    def _homing_started(self):
+        """
+        Whether an INIT lost with the connection reached the drive, for
+        a caller holding the port. _status makes a single attempt then,
+        so each attempt is a call of its own. Without a usable answer
+        the state is unknown and INIT is sent again.
+        """
+        for attempt in range(self.status_retries):
+            try:
+                running, angle, initialized = self._status(force=True)[:3]
+            except (StirrerLockedError,) + _CONNECTION_ERRORS:
+                raise
+            except Exception:
+                continue
+            return running or initialized
+        return False
+
+    def _with_direction(self, direction, *commands):
+        # prepend DIR: unless the controller is known to be set already
+        direction = 1 if direction == 1 else 0
+        if self._direction == direction:
+            return commands
+        return (f'DIR:{direction}',) + commands
+
+    def _read_frame(self, timeout=None):
+        """
+        Receive one answer frame into the decoder buffer.
+
+        Blocks until the termination arrives or `timeout` (default
+        `_query_timeout`) seconds have passed. Returns the end of the frame
+        in the buffer, or -1 if the answer is incomplete.
+        """
+        if timeout is None:
+            timeout = self._query_timeout
+        decoder = self._decoder
+        started = time.monotonic()
+        deadline = started + timeout
+        end = decoder.find()
+        while end < 0:
+            if time.monotonic() >= deadline:
+                self.metrics.count('read_timeouts')
+                self._reply_pending = True
+                break
+            try:
+                # blocks for the port timeout at most
+                data = self.port.read(self.port.in_waiting or 1)
+            except _CONNECTION_ERRORS as e:
+                # the answer is lost with the connection
+                self._reconnect(e)
+                break
+            if data:
+                decoder.feed(data)
+                end = decoder.find()
+        self.metrics.count('wire_seconds', time.monotonic() - started)
+        if self.recorder is not None:
+            frame = decoder.buffer
+            if end >= 0:
+                frame = frame[:end + len(decoder.termination)]
+            self.recorder.record(b'R', frame)
+        return end
+
+    def _read(self, timeout=None):
+        """
+        Read one answer frame up to the read termination, an incomplete
+        answer is returned after `timeout` s.
+        """
+        end = self._read_frame(timeout)
+        if end < 0:
+            answer = bytes(self._decoder.buffer)
+            self._decoder.clear()
+        else:
+            answer = self._decoder.pop(end)
+        return answer.decode()
 
     def _query(self, command):
-        self._write(command)
-        while self.port.in_waiting == 0:
-            time.sleep(self._status_query_delay)
-        answer = []
-        while self.port.in_waiting > 0:
-            partial = self._read(self.port.in_waiting)
-            answer.append(partial)
-            time.sleep(.01)
-        answer = ''.join(answer)
-        return answer
+        # the answer has to be read before anybody else writes
+        with self._transactions:
+            started = time.monotonic()
+            self._write(command)
+            answer = self._read()
+            self.metrics.observe('query_seconds', time.monotonic() - started,
+                                 command=command)
+            return answer
 
     @property
     def current_angle(self):
@@ -91,27 +631,20 @@ class Stirrer(object):
 
     def _clip_angle(self, angle):
         # angle only values 0 <= angle < 360 are allowed
-        # check if the angle needs unwraping
-        while angle >= 360:
-            angle -= 360
-        while angle < 0:
-            angle += 360
-        return angle
+        angle = angle % 360
+        # tiny negative angles round up to 360
+        return 0.0 if angle >= 360 else angle
 
     @current_angle.setter
     def current_angle(self, angle):
         angle = self._clip_angle(angle)
+        start = self._start_angle()
         # Move Absolute
-        self._write(f'RMA:{angle}')
-        self._wait()
-
-        if self._angle_error < abs(self.current_angle - angle):
-            raise AngleError(
-                angle,
-                self.current_angle,
-                self._angle_error)
-        if self._error:
-            raise Exception(self._error_message)
+        with self._transactions:
+            self._write(f'RMA:{angle}')
+            generation = self._expect_move(start, angle)
+        self._wait(generation)
+        self._check_arrival(angle)
 
     @property
     def motor_running(self):
@@ -137,157 +670,439 @@ class Stirrer(object):
         return self._error_message
 
     def initialize_drive(self):
-        self._status()
-        if not self.drive_initialized:
-            self._write('INIT')
-            self._wait()
+        initialized = self.drive_initialized
+        if not initialized:
+            with self._transactions:
+                # another thread may have sent INIT meanwhile, usually
+                # answered from the snapshot just taken
+                initialized = self.drive_initialized
+                if not initialized:
+                    self._write('INIT')
+                    generation = self._generation
+        if not initialized:
+            self._wait(generation)
         return self.drive_initialized
 
     def stop_motor(self):
-        self._write('STOP')
-        self._wait()
+        """
+        Send STOP ahead of all pending commands and queries. Waits of
+        other threads for earlier commands raise MotionStoppedError.
+        """
+        requested = time.monotonic()
+        with self._transactions.request(PRIORITY_STOP):
+            with self._stop_condition:
+                self._stop_count += 1
+                self._stop_condition.notify_all()
+            self._write('STOP')
+        self.last_stop_latency = time.monotonic() - requested
+        self.metrics.observe('stop_latency_seconds', self.last_stop_latency)
+        try:
+            self._wait()
+        except MotionStoppedError:
+            # superseded by a later STOP, which waits for the motor itself
+            pass
         return self.motor_running
 
     def run_clockwise(self):
-        self._write('DIR:1')
-        time.sleep(self._inter_cmd_wait_time)
-        self._write('RMS')
+        with self._transactions:
+            self._write_batch(self._with_direction(1, 'RMS'))
         self._wait2()
         return self.motor_running
 
     def step_clockwise_by(self, step):
-        self._write('DIR:1')
-        time.sleep(self._inter_cmd_wait_time)
-        pos = self.current_angle + step
-        pos = self._clip_angle(pos)
-        self._write(f'RMA:{abs(int(pos))}')
-        self._wait2()
+        start = self.current_angle
+        pos = self._clip_angle(start + step)
+        with self._transactions:
+            self._write_batch(
+                self._with_direction(1, f'RMA:{abs(int(pos))}'))
+            generation = self._expect_move(start, abs(int(pos)))
+        self._wait2(generation)
         return self.motor_running
 
     def run_anti_clockwise(self):
-        self._write('DIR:0')
-        time.sleep(self._inter_cmd_wait_time)
-        self._write('RMS')
+        with self._transactions:
+            self._write_batch(self._with_direction(0, 'RMS'))
         self._wait2()
         return self.motor_running
 
     def step_anti_clockwise_by(self, step):
-        self._write('DIR:0')
-        time.sleep(self._inter_cmd_wait_time)
-        pos = self.current_angle - step
-        pos = self._clip_angle(pos)
-        self._write(f'RMA:{abs(int(pos))}')
-        self._wait2()
+        start = self.current_angle
+        pos = self._clip_angle(start - step)
+        with self._transactions:
+            self._write_batch(
+                self._with_direction(0, f'RMA:{abs(int(pos))}'))
+            generation = self._expect_move(start, abs(int(pos)))
+        self._wait2(generation)
         return self.motor_running
 
-    def goto_angle(self, angle, direction = 1):
+    def goto_angle(self, angle, direction=None):
         """
-        direction = 1 -> clockwise
+        direction = 1 -> clockwise, 0 -> anti-clockwise,
+        None -> the shorter way
         """
-        if direction == 1:
-            self._write('DIR:1')
-        else:
-            self._write('DIR:0')
-        time.sleep(self._inter_cmd_wait_time)
         angle = self._clip_angle(angle)
-        self._write(f'RMA:{abs(int(angle))}')
-        self._wait2()
+        start = self._start_angle()
+        target = abs(int(angle))
+        with self._transactions:
+            if direction is None:
+                direction = shortest_direction(
+                    start, target,
+                    1 if self._direction is None else self._direction)
+            self._write_batch(
+                self._with_direction(direction, f'RMA:{target}'))
+            generation = self._expect_move(start, target)
+        self._wait2(generation)
         return self.motor_running
 
+    def plan_route(self, angles, direction=None, start=None):
+        """
+        Order `angles` for the shortest total travel time from `start`
+        (default the current angle), returns a list of (angle, direction)
+        for goto_angle. A fixed `direction` forces all moves that way.
+        """
+        if start is None:
+            start = self.current_angle
+        parameters = self.stirrer_parameters
+        return plan_route(
+            start,
+            [self._clip_angle(angle) for angle in angles],
+            direction,
+            lambda distance: travel_time(
+                distance,
+                parameters['maxspeed'],
+                parameters['minspeed'],
+                parameters['acc']))
+
+
+    def travel_time(self, start, target, direction=None):
+        """
+        predicted duration in s of a move from `start` to `target`,
+        an unknown `direction` (None) assumes the longer way
+        """
+        parameters = self.stirrer_parameters
+        if direction is None:
+            distance = max(travel_distance(start, target, 1),
+                           travel_distance(start, target, 0))
+        else:
+            distance = travel_distance(start, target, direction)
+        return travel_time(
+            distance,
+            parameters['maxspeed'],
+            parameters['minspeed'],
+            parameters['acc'])
+
+    def _start_angle(self):
+        # the start of a move for the motion model, without a query if
+        # the motor was seen stopped after the last motion command
+        if self._stopped_angle is not None:
+            return self._stopped_angle
+        return self.current_angle
+
+    def _expect_move(self, start, target):
+        # remember the predicted move for _wait and _wait2, to be called
+        # in the transaction of the command; returns its stop generation
+        duration = self.travel_time(start, target, self._direction)
+        self._move = (target, time.monotonic(), duration, self._direction,
+                      self._generation)
+        return self._generation
+
+    def _move_deadlines(self, move):
+        # (predicted arrival, timeout) of a move from _expect_move
+        target, started, duration, direction, generation = move
+        arrival = started + duration
+        timeout = (started + duration * self._move_timeout_factor
+                   + self._move_timeout_margin)
+        return arrival, timeout
+
+    def _at_target(self, angle, target):
+        return angle_deviation(angle, target) <= self._angle_error
+
+    def _sleep(self, seconds):
+        time.sleep(seconds)
+        self.metrics.count('sleep_seconds', seconds)
+
+    def _pause(self, seconds, generation):
+        # sleep, but give up once a STOP followed the awaited command
+        started = time.monotonic()
+        with self._stop_condition:
+            stopped = self._stop_condition.wait_for(
+                lambda: self._stop_count != generation,
+                max(seconds, 0))
+        self.metrics.count('sleep_seconds', time.monotonic() - started)
+        if stopped:
+            raise MotionStoppedError()
 
     #wait while motor is running
-    def _wait(self):
+    def _wait(self, generation=None):
+        # `generation` from _expect_move ties the wait to its command,
+        # a STOP sent after the command raises MotionStoppedError
+        move = self._move
+        if generation is None:
+            generation = self._generation
+        if self._stop_count != generation:
+            raise MotionStoppedError()
+        if move is None:
+            return self._wait_polling(generation)
+        reconnects = self._reconnects
+        arrival, timeout = self._move_deadlines(move)
+        # sleep until shortly before the predicted arrival
+        self._pause(max(arrival - time.monotonic() - self._settle_margin,
+                        self._confirm_interval),
+                    generation)
+        while True:
+            self.metrics.count('wait_iterations', wait='_wait')
+            running, angle = self._status(force=True)[:2]
+            now = time.monotonic()
+            if (reconnects != self._reconnects and not running
+                    and not self._at_target(angle, move[0])
+                    and self._stop_count == generation):
+                # the move was cut off together with the connection
+                reconnects = self._reconnects
+                move = self._resume_move(angle, move)
+                generation = move[4]
+                arrival, timeout = self._move_deadlines(move)
+                continue
+            # a stopped motor short of the target may not have started yet
+            if not running and (self._at_target(angle, move[0])
+                                or now >= arrival):
+                break
+            if now >= timeout:
+                self.metrics.count('wait_timeouts', wait='_wait')
+                print(f"Waiting for motor to finish movement "
+                      f"timed out. Waited {now - arrival:.2f} s "
+                      f"longer than predicted.")
+                break
+            # still running before the predicted arrival, check again then
+            self._pause(max(arrival - now, self._confirm_interval),
+                        generation)
+        if self._move is move:
+            self._move = None
+        return self._current_angle
+
+    def _resume_move(self, angle, move):
+        # send the move again, returns the new move
+        target, started, duration, direction, generation = move
+        print(f"Resuming the move to {target} from {angle}")
+        self.metrics.count('resumed_moves')
+        with self._transactions:
+            command = f'RMA:{target}'
+            if direction is None:
+                self._write(command)
+            else:
+                self._write_batch(self._with_direction(direction, command))
+            self._expect_move(angle, target)
+            return self._move
+
+    def _wait_polling(self, generation):
         wait_interval = 0.3
         wait_duration = 0
 
-        time.sleep(wait_interval)
+        self._pause(wait_interval, generation)
         wait_duration += wait_interval
 
-        while self.motor_running:
-            time.sleep(wait_interval)
+        while self._status(force=True)[0]:
+            self.metrics.count('wait_iterations', wait='_wait')
+            self._pause(wait_interval, generation)
             wait_duration += wait_interval
             if wait_duration >= self._timeout:
+                self.metrics.count('wait_timeouts', wait='_wait')
                 print(f"Waiting for motor to finish movement "
                       f"timed out. Waited {wait_duration} s.")
                 break
         return self._current_angle
     
     # wait until motor is running
-    def _wait2(self):
+    def _wait2(self, generation=None):
+        move = self._move
+        if generation is None:
+            generation = self._generation
+        if self._stop_count != generation:
+            raise MotionStoppedError()
+        if move is None:
+            return self._wait2_polling(generation)
+        arrival, timeout = self._move_deadlines(move)
+        self._pause(self._confirm_interval, generation)
+        while True:
+            self.metrics.count('wait_iterations', wait='_wait2')
+            running, angle = self._status(force=True)[:2]
+            now = time.monotonic()
+            # short moves may already be finished
+            if running or (now >= arrival
+                           and self._at_target(angle, move[0])):
+                break
+            if now >= timeout:
+                self.metrics.count('wait_timeouts', wait='_wait2')
+                print(f"Waiting for motor to start movement "
+                      f"timed out. Waited {now - arrival:.2f} s "
+                      f"longer than predicted.")
+                break
+            self._pause(self._confirm_interval, generation)
+        return self._current_angle
+
+    def _wait2_polling(self, generation):
         wait_interval = 0.3
         wait_duration = 0
 
-        time.sleep(wait_interval)
+        self._pause(wait_interval, generation)
         wait_duration += wait_interval
 
-        while not self.motor_running:
-            time.sleep(wait_interval)
+        while not self._status(force=True)[0]:
+            self.metrics.count('wait_iterations', wait='_wait2')
+            self._pause(wait_interval, generation)
             wait_duration += wait_interval
             if wait_duration >= self._timeout:
+                self.metrics.count('wait_timeouts', wait='_wait2')
                 print(f"Waiting for motor to start movement "
                       f"timed out. Waited {wait_duration} s.")
                 break
         return self._current_angle
 
-    def _status(self):
-        for attempt in range(self.status_retries):
-            try:
-                answer = self._query('?')
+    def refresh_status(self):
+        """
+        query the controller, bypassing the status cache
+        """
+        return self._status(force=True)
 
-                if "is locked" in answer:
-                    print(f"The Stirrer answers: {answer}")
-                    print("Stirrer is locked!\n"
-                          "Try to turn it off and on again ;)")
-                    raise StirrerLockedError()
+    def _status(self, force=False):
+        """
+        Return the state snapshot (motor_running, current_angle,
+        drive_initialized, error, error_message).
 
-                answer = answer.split(',')
-
-                self._motor_running = (answer[0] == '0')
-                self._current_angle = float(answer[1])
-                self._drive_initialized = (answer[2] == '0')
-                self._error = (answer[3] == '1')
-                self._error_message = ""
-                if self._error:
-                    # hier funktionert was nicht,
-                    # der Controller gibt Müll zurück
-                    try:
-                        self._error_message = self._query('ERREAD')
-                    except UnicodeDecodeError:
-                        print("WARNING: could not decode error message")
-
-                return (
-                    self._motor_running,
-                    self._current_angle,
-                    self._drive_initialized,
-                    self._error,
-                    self._error_message
-                )
-
-            except IndexError:
-                time.sleep(self._status_query_delay)
-            except ValueError:
-                print(f"Unparsable device message {answer}")
-                time.sleep(self._status_query_delay)
+        One '?' query fills all fields. A snapshot younger than
+        `status_ttl`, or one completed by another thread while this call
+        was waiting for the port, is returned without a new query unless
+        `force` is set.
+        """
+        requested = time.monotonic()
+        answer = None
+        # a caller holding the port would keep it during the retries,
+        # e.g. from a STOP, so it gets a single attempt
+        retries = 1 if self._transactions.held() else self.status_retries
+        for attempt in range(retries):
+            with self._transactions.request(PRIORITY_STATUS):
+                if not force and self._status_time is not None:
+                    if (self._status_time >= requested
+                            or requested - self._status_time
+                            < self.status_ttl):
+                        self.metrics.count('status_cache_hits')
+                        return self._status_snapshot
+                snapshot, answer = self._query_status()
+                if snapshot is not None:
+                    self._status_snapshot = snapshot
+                    self._status_time = time.monotonic()
+                    self._stopped_angle = None if snapshot[0] else snapshot[1]
+                    return snapshot
+            # retry without blocking the port, e.g. for a STOP
+            self.metrics.count('status_retries')
+            self._sleep(self._status_query_delay)
         else:
             exception = Exception(
                 f"Current Stirrer State could not be queried, "
                 f"Received: \"{answer}\"")
             raise exception
 
+    def _query_status(self):
+        """
+        One '?' round trip, parsed in place in the decoder buffer.
+        Returns (snapshot, None) or, for unusable answers, (None, answer).
+        """
+        with self._transactions:
+            started = time.monotonic()
+            self._write('?')
+            end = self._read_frame()
+            self.metrics.observe('query_seconds', time.monotonic() - started,
+                                 command='?')
+            decoder = self._decoder
+            record = None
+            if end >= 0:
+                record = parse_status(decoder.buffer, 0, end)
+            if record is None:
+                self._reply_pending = True
+                if end < 0:
+                    answer = bytes(decoder.buffer)
+                    decoder.clear()
+                else:
+                    answer = decoder.pop(end)
+                answer = answer.decode(errors='replace')
+                if "is locked" in answer:
+                    print(f"The Stirrer answers: {answer}")
+                    print("Stirrer is locked!\n"
+                          "Try to turn it off and on again ;)")
+                    raise StirrerLockedError()
+                if end >= 0:
+                    print(f"Unparsable device message {answer}")
+                return None, answer
+            decoder.consume(end)
+            return self._update_status(record), None
+
+    def _update_status(self, record):
+        self._motor_running = record.motor_running
+        self._current_angle = record.current_angle
+        self._drive_initialized = record.drive_initialized
+        self._error = record.error
+        self._error_message = ""
+        if self._error:
+            # hier funktionert was nicht,
+            # der Controller gibt Müll zurück
+            try:
+                self._error_message = self._query('ERREAD')
+            except UnicodeDecodeError:
+                print("WARNING: could not decode error message")
+
+        return (
+            self._motor_running,
+            self._current_angle,
+            self._drive_initialized,
+            self._error,
+            self._error_message
+        )
+
+    def sweep(self, schedule, direction=1, settle_delay=0.0, cycle=False):
+        """
+        Step through the angles of `schedule` and yield a SettledPosition
+        each time a position settled within _angle_error and then rested
+        for `settle_delay` s. The next move starts when the loop body
+        returns:
+
+            for position in stirrer.sweep(angles, settle_delay=0.2):
+                acquire(position.angle)
+
+        Arrivals are confirmed at the predicted arrival time, usually with
+        a single status query. The generator ends after a STOP.
+        """
+        steps = SteppedSweep(self, schedule, direction=direction, cycle=cycle)
+        while True:
+            try:
+                angle = steps.advance()
+                if angle is None:
+                    return
+                if settle_delay > 0:
+                    self._pause(settle_delay, steps._generation)
+            except MotionStoppedError:
+                return
+            yield SettledPosition(
+                steps.index, steps._angle(steps.index), angle, steps.settled)
+
     def set_next_angle(self, angle):
         self.next_angle = self._clip_angle(angle)
         self._write(f'DEG:{self.next_angle}')
 
     def goto_next_angle(self):
-        if not self.next_angle:
+        if self.next_angle is None:
             return
+        start = self._start_angle()
         # Move Absolute to stored position
-        self._write('RMT')
-        self._wait()
+        with self._transactions:
+            self._write('RMT')
+            generation = self._expect_move(start, self.next_angle)
+        self._wait(generation)
+        self._check_arrival(self.next_angle)
 
-        if self._angle_error < abs(self.current_angle - self.next_angle):
+    def _check_arrival(self, angle):
+        # 359.8 reached for 0 is on target
+        if self._angle_error < angle_deviation(self.current_angle, angle):
             raise AngleError(
-                self.next_angle,
+                angle,
                 self.current_angle,
                 self._angle_error)
         if self._error:
@@ -295,12 +1110,201 @@ class Stirrer(object):
 
 
     def close(self):
-        self.port.close()
+        self._closed = True
+        if self.port is not None:
+            self.port.close()
         self._drive_initialized = False
         #self._
 
     def __del__(self):
-        self.port.close()
+        if getattr(self, 'port', None) is not None:
+            self.port.close()
+
+class SettledPosition(object):
+    """
+    a sweep position reached by Stirrer.sweep, `settled` is the
+    time.monotonic() of the status query confirming the arrival
+    """
+    __slots__ = ('index', 'target', 'angle', 'settled')
+
+    def __init__(self, index, target, angle, settled):
+        self.index = index
+        self.target = target
+        self.angle = angle
+        self.settled = settled
+
+    def __iter__(self):
+        yield self.index
+        yield self.target
+        yield self.angle
+        yield self.settled
+
+    def __repr__(self):
+        return (f"SettledPosition(index={self.index}, "
+                f"target={self.target}, angle={self.angle}, "
+                f"settled={self.settled})")
+
+
+class SteppedSweep(object):
+    """
+    Steps a Stirrer through a sequence of angles, e.g. a schedule of
+    stirrer_schedule. The angles are wrapped when they are sent.
+
+    The next target is preloaded with DEG: while the stirrer dwells at
+    the current position, so advancing is a single RMT command.
+    """
+
+    def __init__(self, stirrer, angles, direction=1, cycle=False):
+        self.stirrer = stirrer
+        self.angles = angles
+        self.direction = direction
+        self.cycle = cycle
+        # index and time.monotonic() of the position reached last
+        self.index = -1
+        self.settled = None
+        self._preloaded = None
+        # a STOP invalidates all further steps
+        self._generation = stirrer._stop_count
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        angle = self.advance()
+        if angle is None:
+            raise StopIteration
+        return angle
+
+    @property
+    def finished(self):
+        return self._next_index() is None
+
+    def _next_index(self):
+        index = self.index + 1
+        if index >= len(self.angles):
+            if not self.cycle or len(self.angles) == 0:
+                return None
+            index = 0
+        return index
+
+    def _angle(self, index):
+        return self.stirrer._clip_angle(float(self.angles[index]))
+
+    def preload(self):
+        """
+        send the next target to the controller, returns its index
+        """
+        index = self._next_index()
+        if index is not None and index != self._preloaded:
+            self.stirrer.set_next_angle(self._angle(index))
+            self._preloaded = index
+        return index
+
+    def advance(self):
+        """
+        Move to the next position and preload the one after it.
+        Returns the angle reached, or None if the sweep is finished.
+        """
+        index = self._next_index()
+        if index is None:
+            return None
+        start = self.stirrer._start_angle()
+        with self.stirrer._transactions:
+            if self.stirrer._stop_count != self._generation:
+                raise MotionStoppedError()
+            # RMT must not be preceded by another client's DEG: or DIR:
+            commands = ('RMT',)
+            if self._preloaded != index:
+                self.stirrer.next_angle = self._angle(index)
+                commands = (f'DEG:{self.stirrer.next_angle}',) + commands
+            self._preloaded = None
+            self.stirrer._write_batch(
+                self.stirrer._with_direction(self.direction, *commands))
+            generation = self.stirrer._expect_move(
+                start, self.stirrer.next_angle)
+        self.stirrer._wait(generation)
+        self.stirrer._check_arrival(self.stirrer.next_angle)
+        # the time of the status query that confirmed the arrival
+        self.settled = self.stirrer._status_time or time.monotonic()
+        self.index = index
+        self.preload()
+        return self.stirrer._current_angle
+
+
+class DwellScheduler(object):
+    """
+    Runs a SteppedSweep against absolute monotonic deadlines.
+
+    mode = 'settled' -> each position is held for `tau` s after it settled
+    mode = 'cadence' -> a move is started every `tau` s after the start
+
+    Deadlines are computed from fixed reference times, so move durations
+    and polling slop do not accumulate over the sweep. The dwell actually
+    achieved at each position is recorded in `dwells`.
+    """
+
+    def __init__(self, sweep, tau, mode='settled'):
+        if mode not in ('settled', 'cadence'):
+            raise ValueError(f"unknown dwell mode {mode!r}")
+        self.sweep = sweep
+        self.tau = tau
+        self.mode = mode
+        # (index, angle, planned dwell, actual dwell) per position
+        self.dwells = []
+
+    def run(self, on_position=None, stop_event=None):
+        """
+        Step through the sweep until it is finished or `stop_event` is set.
+
+        `on_position(index, angle, settled)` is called after each position
+        settled, `settled` is the time.monotonic() of the confirmation.
+        """
+        if stop_event is None:
+            stop_event = threading.Event()
+        self.dwells = []
+        start = time.monotonic()
+        count = 0
+        while not stop_event.is_set():
+            try:
+                angle = self.sweep.advance()
+            except MotionStoppedError:
+                break
+            if angle is None:
+                break
+            settled = self.sweep.settled
+            count += 1
+            if self.mode == 'settled':
+                deadline = settled + self.tau
+            else:
+                deadline = start + count * self.tau
+            if on_position is not None:
+                on_position(self.sweep.index, angle, settled)
+            stop_event.wait(max(deadline - time.monotonic(), 0))
+            self.dwells.append((
+                self.sweep.index,
+                angle,
+                deadline - settled,
+                time.monotonic() - settled))
+        return self.dwells
+
+    def statistics(self):
+        """
+        dwell statistics in s, jitter is the deviation of the actual from
+        the planned dwell
+        """
+        if not self.dwells:
+            return {}
+        actual = [dwell[3] for dwell in self.dwells]
+        jitter = [dwell[3] - dwell[2] for dwell in self.dwells]
+        return {
+            'positions': len(self.dwells),
+            'dwell_mean': statistics.fmean(actual),
+            'dwell_min': min(actual),
+            'dwell_max': max(actual),
+            'jitter_mean': statistics.fmean(jitter),
+            'jitter_stdev': statistics.pstdev(jitter),
+            'jitter_max': max(jitter, key=abs)}
+
 
 class AngleError(Exception):
 
@@ -319,6 +1323,12 @@ class AngleError(Exception):
         )
 
 
+class MotionStoppedError(Exception):
+
+    def __init__(self):
+        super().__init__('Motion was stopped by a STOP command')
+
+
 class StirrerLockedError(Exception):
     def __init__(self):
 
@@ -334,7 +1344,11 @@ if __name__ == '__main__':
 
 #    print('run clockwise for 20 sec')
     stirrer.run_clockwise()
-    while True:
+    # sleep instead of spinning, Ctrl-C stops the motor via atexit
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
         pass
 #    for i in range(20):
 #        time.sleep(1)
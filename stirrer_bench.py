@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Latency and throughput benchmark for the Stirrer driver.
+
+Every operation runs against a StirrerSimulator, so no hardware is
+needed. Results can be written as JSON and compared with an earlier run:
+
+    python stirrer_bench.py --json new.json --compare old.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+from stirrer import Stirrer, SteppedSweep, DwellScheduler
+from stirrer_sim import StirrerSimulator
+
+
+def percentile(values, p):
+    """
+    nearest-rank percentile of `values`, p in 0..100
+    """
+    ordered = sorted(values)
+    rank = max(int(round(p / 100 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+class Benchmark(object):
+
+    def __init__(
+            self,
+            baudrate=9600,
+            response_delay=0.005,
+            time_scale=10.0,
+            repeat=20,
+            sweep_positions=36):
+        self.baudrate = baudrate
+        self.response_delay = response_delay
+        self.time_scale = time_scale
+        self.repeat = repeat
+        self.sweep_positions = sweep_positions
+        self.results = {}
+
+    def _measure(self, name, operation, setup=None, count=None):
+        """
+        run `operation` `count` times, `setup` runs untimed before each
+        """
+        latencies = []
+        traffic = 0
+        for i in range(self.repeat if count is None else count):
+            if setup is not None:
+                setup(i)
+            before = self.sim.bytes_received + self.sim.bytes_sent
+            start = time.perf_counter()
+            operation(i)
+            latencies.append(time.perf_counter() - start)
+            traffic += self.sim.bytes_received + self.sim.bytes_sent - before
+        self.results[name] = {
+            'count': len(latencies),
+            'mean': sum(latencies) / len(latencies),
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+            'bytes_per_op': traffic / len(latencies)}
+        return self.results[name]
+
+    def run(self):
+        with StirrerSimulator(
+                time_scale=self.time_scale,
+                response_delay=self.response_delay,
+                baudrate=self.baudrate) as self.sim:
+            stirrer = Stirrer(
+                {**self.sim.open_tcp(), 'baudrate': self.baudrate},
+                stirrer_parameters=self.sim.scaled_stirrer_parameters())
+            try:
+                self._run(stirrer)
+            finally:
+                stirrer.close()
+        return self.results
+
+    def _run(self, stirrer):
+        self._measure('_status', lambda i: stirrer._status(force=True))
+        # the property read itself, not the status cache
+        status_ttl, stirrer.status_ttl = stirrer.status_ttl, 0
+        self._measure('current_angle', lambda i: stirrer.current_angle)
+        stirrer.status_ttl = status_ttl
+
+        def goto_angle(i):
+            stirrer.goto_angle((i * 37) % 360)
+            stirrer._wait()
+        self._measure('goto_angle', goto_angle)
+
+        def step_clockwise_by(i):
+            stirrer.step_clockwise_by(10)
+            stirrer._wait()
+        self._measure('step_clockwise_by', step_clockwise_by)
+
+        def uninitialize(i):
+            self.sim.initialized = False
+            stirrer.refresh_status()
+        self._measure(
+            'initialize_drive',
+            lambda i: stirrer.initialize_drive(),
+            setup=uninitialize,
+            count=min(self.repeat, 5))
+
+        def run_clockwise(i):
+            stirrer.run_clockwise()
+        self._measure(
+            'stop_motor', lambda i: stirrer.stop_motor(), setup=run_clockwise)
+
+        step = 360 / self.sweep_positions
+        angles = [i * step for i in range(self.sweep_positions)]
+
+        def sweep(i):
+            DwellScheduler(SteppedSweep(stirrer, angles), 0).run()
+        result = self._measure('tuned_sweep', sweep, count=3)
+        result['positions'] = self.sweep_positions
+        result['positions_per_hour'] = \
+            3600 * self.sweep_positions / result['mean']
+
+    def report(self):
+        lines = [f"{'operation':<20}{'p50/ms':>10}{'p95/ms':>10}"
+                 f"{'p99/ms':>10}{'bytes/op':>10}"]
+        for name, result in self.results.items():
+            lines.append(
+                f"{name:<20}{result['p50']*1000:>10.2f}"
+                f"{result['p95']*1000:>10.2f}{result['p99']*1000:>10.2f}"
+                f"{result['bytes_per_op']:>10.1f}")
+            if 'positions_per_hour' in result:
+                lines.append(
+                    f"{'':<20}{result['positions_per_hour']:.0f} "
+                    f"positions/h at time scale {self.time_scale}")
+        return '\n'.join(lines)
+
+    def to_dict(self):
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+                capture_output=True, text=True).stdout.strip() or None
+        except OSError:
+            commit = None
+        return {
+            'commit': commit,
+            'python': platform.python_version(),
+            'parameters': {
+                'baudrate': self.baudrate,
+                'response_delay': self.response_delay,
+                'time_scale': self.time_scale,
+                'repeat': self.repeat,
+                'sweep_positions': self.sweep_positions},
+            'results': self.results}
+
+
+def compare(old, new):
+    """
+    p50 ratios new/old per operation, < 1 means faster
+    """
+    lines = [f"{'operation':<20}{'old p50/ms':>12}{'new p50/ms':>12}"
+             f"{'ratio':>8}"]
+    for name, result in new['results'].items():
+        if name not in old['results']:
+            continue
+        before = old['results'][name]['p50']
+        after = result['p50']
+        lines.append(f"{name:<20}{before*1000:>12.2f}{after*1000:>12.2f}"
+                     f"{after/before:>8.2f}")
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--baudrate', type=int, default=9600)
+    parser.add_argument('--response-delay', type=float, default=0.005,
+                        help="controller answer delay in s")
+    parser.add_argument('--time-scale', type=float, default=10.0,
+                        help="speed-up of the simulated motion")
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--sweep-positions', type=int, default=36)
+    parser.add_argument('--json', metavar='FILE',
+                        help="write the results as JSON, - for stdout")
+    parser.add_argument('--compare', metavar='FILE',
+                        help="JSON results of an earlier run")
+    args = parser.parse_args()
+
+    benchmark = Benchmark(
+        baudrate=args.baudrate,
+        response_delay=args.response_delay,
+        time_scale=args.time_scale,
+        repeat=args.repeat,
+        sweep_positions=args.sweep_positions)
+    benchmark.run()
+    result = benchmark.to_dict()
+    if args.json == '-':
+        json.dump(result, sys.stdout, indent=2)
+    else:
+        print(benchmark.report())
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump(result, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            print(compare(json.load(f), result))
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Run stirrer sweeps from a sweep definition file without the GUI.
+
+    python stirrer_cli.py campaign.json --port /dev/ttyUSB0 --log run.log
+
+The definition file is JSON with a list of sweeps, executed in order:
+
+    {"initialize": true,
+     "sweeps": [
+        {"angles": [0, 90, 180, 270], "dwell": 2.0, "repeat": 3},
+        {"schedule": {"type": "uniform", "step": 10, "start": "current"},
+         "dwell": 1.5, "direction": 0, "mode": "cadence"}]}
+
+A sweep takes its positions from "angles" or from a "schedule" of
+stirrer_schedule (uniform, nonuniform, random_positions or stratified,
+with their keyword arguments; a "start" of "current" is the current
+angle). "dwell" is in s, "direction" 1 is clockwise, "mode" is a
+DwellScheduler mode and "repeat" runs the sweep several times.
+
+Every position reached is logged as one tab separated line with the
+time, sweep, repetition, index, target and measured angle. Ctrl-C stops
+the motor at once, a second Ctrl-C aborts.
+"""
+import argparse
+import datetime
+import json
+import signal
+import sys
+import threading
+import time
+
+import stirrer_schedule
+from stirrer import Stirrer, SteppedSweep, DwellScheduler, MotionStoppedError
+
+SCHEDULES = ('uniform', 'nonuniform', 'random_positions', 'stratified')
+
+
+def load_sweeps(path):
+    """
+    read a sweep definition file, returns (initialize, sweeps)
+    """
+    with open(path) as f:
+        definition = json.load(f)
+    if isinstance(definition, list):
+        definition = {'sweeps': definition}
+    sweeps = definition.get('sweeps')
+    if not sweeps:
+        raise ValueError(f"{path} defines no sweeps")
+    for number, sweep in enumerate(sweeps):
+        if ('angles' in sweep) == ('schedule' in sweep):
+            raise ValueError(
+                f"sweep {number} needs either 'angles' or 'schedule'")
+        if 'schedule' in sweep \
+                and sweep['schedule'].get('type') not in SCHEDULES:
+            raise ValueError(
+                f"sweep {number}: schedule type has to be one of "
+                f"{', '.join(SCHEDULES)}")
+        if sweep.get('mode', 'settled') not in ('settled', 'cadence'):
+            raise ValueError(f"sweep {number}: unknown mode {sweep['mode']}")
+    return definition.get('initialize', True), sweeps
+
+
+class SweepRunner(object):
+    """
+    Executes sweep definitions against a Stirrer and logs every position.
+    """
+
+    def __init__(self, stirrer, log=None):
+        self.stirrer = stirrer
+        # file-like objects receiving the position log
+        self.logs = [sys.stdout] if log is None else [sys.stdout, log]
+        self.stop_event = threading.Event()
+        self.stop_thread = None
+        self.schedulers = []
+
+    def angles(self, sweep):
+        if 'angles' in sweep:
+            return sweep['angles']
+        parameters = dict(sweep['schedule'])
+        kind = parameters.pop('type')
+        schedule = getattr(stirrer_schedule, kind)
+        if kind in ('uniform', 'nonuniform'):
+            # step the way the sweep moves
+            parameters.setdefault('direction', sweep.get('direction', 1))
+        if parameters.get('start') == 'current':
+            parameters['start'] = self.stirrer.current_angle
+        return schedule(**parameters)
+
+    def stop(self):
+        """
+        stop the sweep and the motor, may be called from any thread
+        """
+        if self.stop_event.is_set():
+            return
+        self.stop_event.set()
+        self.stop_thread = threading.Thread(
+            target=self.stirrer.stop_motor, daemon=True)
+        self.stop_thread.start()
+
+    def _log(self, line):
+        for log in self.logs:
+            print(line, file=log, flush=True)
+
+    def run(self, sweeps):
+        """
+        run all sweeps, returns False if the run was stopped
+        """
+        self._log("# time\tsweep\trepetition\tindex\ttarget\tangle")
+        for number, sweep in enumerate(sweeps):
+            for repetition in range(sweep.get('repeat', 1)):
+                if self.stop_event.is_set():
+                    return False
+                steps = SteppedSweep(
+                    self.stirrer,
+                    self.angles(sweep),
+                    direction=sweep.get('direction', 1))
+                scheduler = DwellScheduler(
+                    steps,
+                    sweep.get('dwell', 1.0),
+                    mode=sweep.get('mode', 'settled'))
+                self.schedulers.append(scheduler)
+
+                def on_position(index, angle, settled,
+                                number=number, repetition=repetition,
+                                steps=steps):
+                    # wall-clock time of the settled confirmation
+                    timestamp = datetime.datetime.fromtimestamp(
+                        time.time() - (time.monotonic() - settled))
+                    self._log(
+                        f"{timestamp.isoformat(timespec='milliseconds')}\t"
+                        f"{number}\t{repetition}\t{index}\t"
+                        f"{steps._angle(index):.1f}\t{angle:.1f}")
+                scheduler.run(on_position=on_position,
+                              stop_event=self.stop_event)
+        return not self.stop_event.is_set()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run stirrer sweeps from a sweep definition file.")
+    parser.add_argument('sweeps', help="JSON sweep definition file")
+    parser.add_argument('--port', default=None,
+                        help="serial device or URL, e.g. socket://host:port")
+    parser.add_argument('--baudrate', type=int, default=None)
+    parser.add_argument('--log', metavar='FILE',
+                        help="append the position log to FILE as well")
+    args = parser.parse_args(argv)
+
+    try:
+        initialize, sweeps = load_sweeps(args.sweeps)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    port_parameters = {}
+    if args.port is not None:
+        port_parameters['port'] = args.port
+    if args.baudrate is not None:
+        port_parameters['baudrate'] = args.baudrate
+    stirrer = Stirrer(port_parameters)
+    log = open(args.log, 'a') if args.log else None
+    runner = SweepRunner(stirrer, log)
+
+    def interrupt(signum, frame):
+        print("Stopping, press Ctrl-C again to abort", file=sys.stderr)
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        runner.stop()
+    signal.signal(signal.SIGINT, interrupt)
+
+    finished = False
+    try:
+        try:
+            if initialize and not stirrer.drive_initialized:
+                stirrer.initialize_drive()
+            finished = runner.run(sweeps)
+        except MotionStoppedError:
+            # Ctrl-C during the initialization
+            pass
+        for number, scheduler in enumerate(runner.schedulers):
+            result = scheduler.statistics()
+            if result:
+                print(f"# run {number}: {result['positions']} positions, "
+                      f"mean dwell {result['dwell_mean']:.3f} s, "
+                      f"jitter max {result['jitter_max']*1000:.1f} ms",
+                      file=sys.stderr)
+    finally:
+        if runner.stop_thread is not None:
+            # the motor has to be stopped before the port is closed
+            runner.stop_thread.join()
+        stirrer.close()
+        if log is not None:
+            log.close()
+    return 0 if finished else 130
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Several stirrers of one chamber, each on its own controller, moved in
+parallel.
+
+    group = StirrerGroup([Stirrer({'port': '/dev/ttyUSB0'}),
+                          Stirrer({'port': '/dev/ttyUSB1'})])
+    group.goto_angles([90, 180])
+    for positions in group.sweep(stirrer_schedule.latin_hypercube(50)):
+        acquire()
+"""
+import concurrent.futures
+import threading
+
+from stirrer import SteppedSweep, SettledPosition, MotionStoppedError
+
+
+class _Column(object):
+    # the angles of one unit in a joint schedule, rows are positions
+    def __init__(self, schedule, column):
+        self.schedule = schedule
+        self.column = column
+
+    def __len__(self):
+        return len(self.schedule)
+
+    def __getitem__(self, index):
+        return self.schedule[index][self.column]
+
+
+class StirrerGroup(object):
+    """
+    Runs each operation on all stirrers at once from a thread pool and
+    returns when the last one is done, so a joint move takes as long as
+    the slowest unit.
+
+    A unit raising an exception is recorded in `failed` (index ->
+    exception) and left out of later operations, the others carry on.
+    Results of left out units are None. A STOP ends the operation of all
+    units with MotionStoppedError.
+    """
+
+    def __init__(self, stirrers):
+        self.stirrers = list(stirrers)
+        self.failed = {}
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(len(self.stirrers), 1),
+            thread_name_prefix='StirrerGroup')
+
+    def __len__(self):
+        return len(self.stirrers)
+
+    @property
+    def active(self):
+        """
+        indices of the units that did not fail
+        """
+        return [index for index in range(len(self.stirrers))
+                if index not in self.failed]
+
+    def reset(self, index=None):
+        """
+        take a failed unit, by default all, into the group again
+        """
+        if index is None:
+            self.failed.clear()
+        else:
+            self.failed.pop(index, None)
+
+    def _run(self, function, *arguments):
+        """
+        Call function(stirrer, *unit_arguments) for all active units in
+        parallel, every argument is a sequence with one entry per unit.
+        Waits for all of them and returns their results.
+        """
+        futures = {}
+        for index in self.active:
+            futures[index] = self._executor.submit(
+                function,
+                self.stirrers[index],
+                *[argument[index] for argument in arguments])
+        results = [None] * len(self.stirrers)
+        stopped = False
+        for index, future in futures.items():
+            try:
+                results[index] = future.result()
+            except MotionStoppedError:
+                stopped = True
+            except Exception as e:
+                self.failed[index] = e
+                print(f"Stirrer {index} failed: {e}")
+        if stopped:
+            raise MotionStoppedError()
+        return results
+
+    def initialize(self):
+        return self._run(lambda stirrer: stirrer.initialize_drive())
+
+    def current_angles(self):
+        return self._run(lambda stirrer: stirrer.current_angle)
+
+    @staticmethod
+    def _goto(stirrer, angle, direction):
+        target = abs(int(stirrer._clip_angle(angle)))
+        # a STOP from here on ends the move with MotionStoppedError
+        generation = stirrer._stop_count
+        stirrer.goto_angle(target, direction)
+        stirrer._wait(generation)
+        stirrer._check_arrival(target)
+        return stirrer._current_angle
+
+    def goto_angles(self, angles, directions=None):
+        """
+        Move every unit to its angle and return the measured angles once
+        all of them settled. `directions` per unit as for goto_angle,
+        default is the shorter way.
+        """
+        if directions is None:
+            directions = [None] * len(self.stirrers)
+        return self._run(self._goto, angles, directions)
+
+    def stop(self):
+        """
+        send STOP to all units at once, also while they are moving
+        """
+        # the pool threads may all be busy with moves
+        threads = [threading.Thread(target=stirrer.stop_motor, daemon=True)
+                   for stirrer in self.stirrers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    @staticmethod
+    def _advance(stirrer, steps, settle_delay):
+        angle = steps.advance()
+        if angle is None:
+            return None
+        if settle_delay > 0:
+            stirrer._pause(settle_delay, steps._generation)
+        return SettledPosition(
+            steps.index, steps._angle(steps.index), angle, steps.settled)
+
+    def sweep(self, schedule, direction=1, settle_delay=0.0, cycle=False):
+        """
+        Step through a joint schedule, one row per position and one
+        column per unit (see stirrer_schedule.joint and latin_hypercube).
+        Yields a list with a SettledPosition per unit, None for failed
+        units, once all units settled and rested `settle_delay` s.
+        `direction` is one for all units or a sequence per unit. The
+        generator ends after a STOP or when all units failed.
+        """
+        count = len(self.stirrers)
+        if isinstance(direction, int):
+            direction = [direction] * count
+        steps = [SteppedSweep(stirrer, _Column(schedule, index),
+                              direction=direction[index], cycle=cycle)
+                 for index, stirrer in enumerate(self.stirrers)]
+        while True:
+            try:
+                positions = self._run(
+                    self._advance, steps, [settle_delay] * count)
+            except MotionStoppedError:
+                return
+            if all(position is None for position in positions):
+                return
+            yield positions
+
+    def close(self):
+        self._executor.shutdown()
+        for stirrer in self.stirrers:
+            stirrer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
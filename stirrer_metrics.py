@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+import bisect
+import collections
+import threading
+
+
+class Histogram(object):
+    """
+    Fixed-bucket histogram of values in s, counts are per bucket.
+    """
+    default_buckets = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                       0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+    def __init__(self, buckets=None):
+        if buckets is None:
+            buckets = Histogram.default_buckets
+        self.buckets = tuple(buckets)
+        # the last count is for values above the largest bucket
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """
+        upper bucket bound containing the q-quantile, q in 0..1
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+
+class Metrics(object):
+    """
+    In-process counters and histograms of a Stirrer.
+
+    Metrics are identified by name and keyword labels:
+
+        metrics.count('status_retries')
+        metrics.observe('query_seconds', 0.012, command='?')
+
+    `export` renders them with an exporter, a callable taking the
+    Metrics object, e.g. `text_exporter` or `prometheus_exporter`.
+    """
+
+    def __init__(self, buckets=None):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self.counters = collections.defaultdict(float)
+        self.histograms = {}
+
+    def count(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] += value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def counter(self, name, **labels):
+        return self.counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def histogram(self, name, **labels):
+        return self.histograms.get((name, tuple(sorted(labels.items()))))
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def export(self, exporter=None):
+        if exporter is None:
+            exporter = text_exporter
+        with self._lock:
+            return exporter(self)
+
+
+def _format_labels(labels, extra=()):
+    labels = tuple(labels) + tuple(extra)
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in labels) + '}'
+
+
+def text_exporter(metrics):
+    """
+    human readable dump, one metric per line
+    """
+    lines = []
+    for (name, labels), value in sorted(metrics.counters.items()):
+        lines.append(f"{name}{_format_labels(labels)} {value:g}")
+    for (name, labels), histogram in sorted(metrics.histograms.items()):
+        mean = histogram.sum / histogram.count
+        lines.append(
+            f"{name}{_format_labels(labels)} count={histogram.count} "
+            f"mean={mean*1000:.2f}ms "
+            f"p50<={histogram.quantile(.5)*1000:g}ms "
+            f"p99<={histogram.quantile(.99)*1000:g}ms")
+    return '\n'.join(lines)
+
+
+def prometheus_exporter(metrics, prefix='stirrer'):
+    """
+    Prometheus text exposition format
+    """
+    lines = []
+    typed = set()
+    for (name, labels), value in sorted(metrics.counters.items()):
+        name = f"{prefix}_{name}_total"
+        if name not in typed:
+            lines.append(f"# TYPE {name} counter")
+            typed.add(name)
+        lines.append(f"{name}{_format_labels(labels)} {value:g}")
+    for (name, labels), histogram in sorted(metrics.histograms.items()):
+        name = f"{prefix}_{name}"
+        if name not in typed:
+            lines.append(f"# TYPE {name} histogram")
+            typed.add(name)
+        cumulative = 0
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            cumulative += count
+            lines.append(f"{name}_bucket"
+                         f"{_format_labels(labels, [('le', f'{bound:g}')])}"
+                         f" {cumulative}")
+        lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])}"
+                     f" {histogram.count}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum:g}")
+        lines.append(f"{name}_count{_format_labels(labels)} "
+                     f"{histogram.count}")
+    return '\n'.join(lines) + '\n'
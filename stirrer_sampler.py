@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Timestamped angle streaming of a Stirrer, e.g. in stirring mode.
+
+    stirrer.run_clockwise()
+    with AngleSampler(stirrer) as sampler:
+        for t, angle, running in sampler:
+            ...
+        print(sampler.rpm())
+"""
+import threading
+import time
+
+import numpy as np
+
+SAMPLE_DTYPE = np.dtype([('time', 'f8'), ('angle', 'f8'), ('running', '?')])
+
+
+class AngleSampler(object):
+    """
+    Samples (time.monotonic(), angle, running) of a Stirrer from a
+    background thread into a preallocated ring buffer of `capacity`
+    samples.
+
+    Samples are taken back to back, at the highest rate the link allows,
+    or at most every `interval` s. Each one goes through the status
+    query of the Stirrer, so commands and STOP still take precedence.
+    The time of a sample is the middle of its query.
+    """
+
+    def __init__(self, stirrer, capacity=100000, interval=0.0):
+        self.stirrer = stirrer
+        self.interval = interval
+        self.buffer = np.zeros(capacity, dtype=SAMPLE_DTYPE)
+        # number of samples taken so far, the newest is at count - 1
+        self.count = 0
+        # samples overwritten before the iterator read them
+        self.dropped = 0
+        # exception that ended the sampling thread
+        self.error = None
+        self._condition = threading.Condition()
+        self._running = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._running.set()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running.clear()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _sample(self):
+        capacity = len(self.buffer)
+        try:
+            while self._running.is_set():
+                requested = time.monotonic()
+                running, angle = self.stirrer._status(force=True)[:2]
+                answered = time.monotonic()
+                with self._condition:
+                    self.buffer[self.count % capacity] = (
+                        (requested + answered) / 2, angle, running)
+                    self.count += 1
+                    self._condition.notify_all()
+                if self.interval:
+                    self._running.wait(
+                        max(requested + self.interval - time.monotonic(), 0))
+        except Exception as e:
+            self.error = e
+            print(f"Angle sampling stopped: {e}")
+        finally:
+            with self._condition:
+                self._running.clear()
+                self._condition.notify_all()
+
+    def snapshot(self, last=None):
+        """
+        copy of the buffered samples in chronological order,
+        the newest `last` ones only if given
+        """
+        with self._condition:
+            capacity = len(self.buffer)
+            available = min(self.count, capacity)
+            if last is not None:
+                available = min(available, last)
+            start = self.count - available
+            indices = np.arange(start, self.count) % capacity
+            return self.buffer[indices]
+
+    def __iter__(self):
+        """
+        yield the samples as (time, angle, running) while sampling runs,
+        starting with the next one
+        """
+        capacity = len(self.buffer)
+        with self._condition:
+            position = self.count
+        while True:
+            with self._condition:
+                while position == self.count and self._running.is_set():
+                    self._condition.wait()
+                if position == self.count:
+                    return
+                if self.count - position > capacity:
+                    self.dropped += self.count - position - capacity
+                    position = self.count - capacity
+                sample = self.buffer[position % capacity]
+                position += 1
+            yield (float(sample['time']), float(sample['angle']),
+                   bool(sample['running']))
+
+    def rpm(self, window=1.0):
+        """
+        Rotation rate in rpm over the samples of the last `window` s,
+        positive clockwise, from a straight line fit of the unwrapped
+        angles. None without two running samples in the window.
+        """
+        samples = self.snapshot()
+        if len(samples):
+            samples = samples[samples['time']
+                              >= samples['time'][-1] - window]
+        samples = samples[samples['running']]
+        if len(samples) < 2:
+            return None
+        angles = np.unwrap(samples['angle'], period=360.0)
+        slope = np.polyfit(samples['time'], angles, 1)[0]
+        return slope / 6  # degree/s -> rpm
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Position schedules for stirrer sweeps.
+
+Every schedule is a float64 NumPy array of angles in 0 <= angle < 360,
+one row per position. Joint schedules for several stirrers have one
+column per stirrer. A schedule can be passed to SteppedSweep as is:
+
+    angles = stirrer_schedule.uniform(10, start=stirrer.current_angle)
+    DwellScheduler(SteppedSweep(stirrer, angles), tau=1).run()
+"""
+import numpy as np
+
+
+def wrap(angles, resolution=None):
+    """
+    angles as float array wrapped to 0 <= angle < 360, optionally
+    rounded to multiples of `resolution` degree
+    """
+    angles = np.asarray(angles, dtype=np.float64)
+    if resolution is not None:
+        angles = np.round(angles / resolution) * resolution
+    angles = np.mod(angles, 360.0)
+    # tiny negative angles round up to 360.0
+    angles[angles >= 360.0] = 0.0
+    return angles
+
+
+def uniform(step, start=0.0, direction=1, count=None, resolution=None):
+    """
+    `count` positions `step` degree apart, the first one a step after
+    `start` in `direction` (1 -> clockwise). By default one full turn.
+    """
+    if count is None:
+        count = int(round(360.0 / step))
+    sign = 1 if direction == 1 else -1
+    return wrap(start + sign * step * np.arange(1, count + 1), resolution)
+
+
+def nonuniform(steps, start=0.0, direction=1, resolution=None):
+    """
+    positions reached from `start` by the step sizes `steps` in degree
+    """
+    sign = 1 if direction == 1 else -1
+    steps = np.asarray(steps, dtype=np.float64)
+    return wrap(start + sign * np.cumsum(steps), resolution)
+
+
+def random_positions(count, seed=None, resolution=None):
+    """
+    `count` independent uniformly distributed positions,
+    `seed` is passed to numpy.random.default_rng
+    """
+    rng = np.random.default_rng(seed)
+    return wrap(rng.uniform(0.0, 360.0, count), resolution)
+
+
+def stratified(count, start=0.0, seed=None, resolution=None):
+    """
+    One random position in each of `count` equal sectors, beginning at
+    `start`. The positions are ordered clockwise, so a clockwise sweep
+    visits them within one turn.
+    """
+    rng = np.random.default_rng(seed)
+    sector = 360.0 / count
+    return wrap(start + (np.arange(count) + rng.random(count)) * sector,
+                resolution)
+
+
+def latin_hypercube(count, stirrers=2, seed=None, resolution=None):
+    """
+    Latin hypercube sample of `count` joint positions for `stirrers`
+    stirrers, shape (count, stirrers). Every stirrer takes one position
+    in each of `count` equal sectors. The first stirrer moves through its
+    sectors clockwise, the sectors of the others are shuffled.
+    """
+    rng = np.random.default_rng(seed)
+    strata = np.tile(np.arange(count), (stirrers, 1))
+    for row in strata[1:]:
+        rng.shuffle(row)
+    offsets = rng.random((stirrers, count))
+    return wrap(((strata + offsets) * (360.0 / count)).T, resolution)
+
+
+def joint(*schedules):
+    """
+    All combinations of the positions of one schedule per stirrer,
+    shape (product of the lengths, number of schedules). The last
+    stirrer changes fastest.
+    """
+    grids = np.meshgrid(*[wrap(schedule) for schedule in schedules],
+                        indexing='ij')
+    return np.stack(grids, axis=-1).reshape(-1, len(schedules))
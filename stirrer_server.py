@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+"""
+Share one Stirrer between several processes.
+
+StirrerServer owns the serial port and serves clients over TCP or a Unix
+socket with a JSON-lines protocol. Each request is one line
+
+    {"id": 1, "method": "goto_angle", "params": {"angle": 90}}
+
+answered by {"id": 1, "result": ..., "status": {...}} or
+{"id": 1, "error": {"type": "AngleError", "message": "..."}}, the status
+being the latest known one.
+After {"method": "subscribe"} a client also receives every status change
+as {"status": {...}}. All status comes from one poll loop, so the
+number of clients does not add serial queries.
+
+    python stirrer_server.py --port /dev/stirrer --listen 127.0.0.1:5050
+
+    stirrer = RemoteStirrer(('127.0.0.1', 5050))
+    stirrer.goto_angle(90)
+    stirrer.wait_settled()
+"""
+import itertools
+import json
+import os
+import queue
+import socket
+import socketserver
+import threading
+import time
+
+from stirrer import Stirrer, MotionStoppedError, StirrerLockedError
+
+DEFAULT_ADDRESS = ('127.0.0.1', 5050)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+
+    def setup(self):
+        super().setup()
+        self.lock = threading.Lock()
+        self.subscribed = False
+        self.server.owner._clients.add(self)
+        # commands of this client, executed in order by one thread
+        self.requests = queue.Queue()
+        self.worker = threading.Thread(target=self.work, daemon=True)
+        self.worker.start()
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+            except ValueError:
+                self.send({'id': None, 'error': {
+                    'type': 'ValueError', 'message': "invalid JSON"}})
+                continue
+            if request.get('method') in self.server.owner.immediate:
+                # not queued behind a pending command of the same client
+                threading.Thread(target=self.respond, args=(request,),
+                                 daemon=True).start()
+            else:
+                self.requests.put(request)
+
+    def work(self):
+        while True:
+            request = self.requests.get()
+            if request is None:
+                return
+            self.respond(request)
+
+    def respond(self, request):
+        response = self.server.owner._dispatch(self, request)
+        try:
+            self.send(response)
+        except (OSError, ValueError):
+            # the client is gone
+            pass
+
+    def finish(self):
+        self.server.owner._clients.discard(self)
+        self.requests.put(None)
+        super().finish()
+
+    def send(self, message):
+        data = (json.dumps(message) + '\n').encode()
+        with self.lock:
+            self.wfile.write(data)
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+if hasattr(socketserver, 'ThreadingUnixStreamServer'):
+    class _UnixServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+
+
+class StirrerServer(object):
+    """
+    Serves a Stirrer to JSON-lines clients.
+
+    `address` is a (host, port) tuple for TCP or a path for a Unix socket.
+    Motion commands of all clients are executed one after another, STOP
+    and status requests are executed at once. The status is polled every
+    `poll_interval` s, unless a command queried it more recently anyway.
+    """
+    # methods executed one at a time, in the order of their arrival
+    commands = ('initialize_drive', 'run_clockwise', 'run_anti_clockwise',
+                'step_clockwise_by', 'step_anti_clockwise_by', 'goto_angle',
+                'set_next_angle', 'goto_next_angle', 'wait_settled')
+    # methods executed at once, also while a command of the same client
+    # is pending
+    immediate = ('stop_motor', 'status')
+
+    def __init__(self, stirrer, address=DEFAULT_ADDRESS, poll_interval=0.2):
+        self.stirrer = stirrer
+        self.address = address
+        self.poll_interval = poll_interval
+        self._clients = set()
+        self._command_lock = threading.Lock()
+        self._closing = threading.Event()
+        self._status = None
+        if isinstance(address, str):
+            if os.path.exists(address):
+                os.unlink(address)
+            self._server = _UnixServer(address, _Handler)
+        else:
+            self._server = _TCPServer(address, _Handler)
+            self.address = self._server.server_address[:2]
+        self._server.owner = self
+        self._threads = []
+
+    def start(self):
+        """
+        serve and poll from background threads
+        """
+        for target in (self._server.serve_forever, self._poll):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def serve_forever(self):
+        self.start()
+        try:
+            while not self._closing.wait(1):
+                pass
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
+
+    def close(self):
+        self._closing.set()
+        if self._threads:
+            self._server.shutdown()
+        self._server.server_close()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.unlink(self.address)
+
+    def _status_message(self):
+        stirrer = self.stirrer
+        snapshot = stirrer._status_snapshot
+        if snapshot is None:
+            snapshot = stirrer._status()
+        motor_running, current_angle, drive_initialized, error, \
+            error_message = snapshot
+        # age of the snapshot, wall-clock time for the clients
+        age = time.monotonic() - (stirrer._status_time or time.monotonic())
+        return {
+            'motor_running': motor_running,
+            'current_angle': current_angle,
+            'drive_initialized': drive_initialized,
+            'error': error,
+            'error_message': error_message,
+            'time': time.time() - age}
+
+    def _poll(self):
+        stirrer = self.stirrer
+        while not self._closing.wait(self.poll_interval):
+            try:
+                # reuse snapshots of running commands instead of querying
+                if (stirrer._status_time is None
+                        or time.monotonic() - stirrer._status_time
+                        >= self.poll_interval):
+                    stirrer._status(force=True)
+            except Exception as e:
+                print(f"Status poll failed: {e}")
+                continue
+            snapshot = stirrer._status_snapshot
+            if snapshot == self._status:
+                continue
+            self._status = snapshot
+            message = {'status': self._status_message()}
+            for client in list(self._clients):
+                if not client.subscribed:
+                    continue
+                try:
+                    client.send(message)
+                except OSError:
+                    self._clients.discard(client)
+
+    def _dispatch(self, client, request):
+        method = request.get('method')
+        params = request.get('params') or {}
+        response = {'id': request.get('id')}
+        try:
+            if method == 'subscribe':
+                client.subscribed = True
+                result = self._status_message()
+            elif method == 'status':
+                result = self._status_message()
+            elif method == 'stop_motor':
+                # not queued behind the commands it is meant to stop
+                result = self.stirrer.stop_motor()
+            elif method in self.commands:
+                with self._command_lock:
+                    if method == 'wait_settled':
+                        result = self.stirrer._wait()
+                    else:
+                        result = getattr(self.stirrer, method)(**params)
+            else:
+                raise ValueError(f"unknown method {method!r}")
+            response['result'] = result
+            response['status'] = self._status_message()
+        except Exception as e:
+            response['error'] = {'type': type(e).__name__, 'message': str(e)}
+        return response
+
+
+class RemoteError(Exception):
+    """
+    an exception raised by the Stirrer of a StirrerServer
+    """
+
+    def __init__(self, type, message):
+        self.type = type
+        super().__init__(f"{type}: {message}")
+
+
+class RemoteStirrer(object):
+    """
+    Client of a StirrerServer with the Stirrer methods for motion.
+
+    The status properties return the latest status pushed by the server
+    and never query the stirrer. `on_status(status)` is called from the
+    receiving thread for every status change.
+    """
+
+    def __init__(self, address=DEFAULT_ADDRESS, on_status=None):
+        if isinstance(address, str):
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._socket.connect(address)
+        else:
+            self._socket = socket.create_connection(address)
+        self.on_status = on_status
+        # latest status pushed by the server
+        self.status = None
+        self._file = self._socket.makefile('rb')
+        self._ids = itertools.count(1)
+        # requests may be sent from several threads
+        self._send_lock = threading.Lock()
+        self._condition = threading.Condition()
+        self._responses = {}
+        self._closed = False
+        self._reader = threading.Thread(target=self._receive, daemon=True)
+        self._reader.start()
+        self.status = self._call('subscribe')
+
+    def _receive(self):
+        try:
+            for line in self._file:
+                message = json.loads(line)
+                if 'id' not in message:
+                    self.status = message['status']
+                    if self.on_status is not None:
+                        self.on_status(self.status)
+                    continue
+                with self._condition:
+                    self._responses[message.get('id')] = message
+                    self._condition.notify_all()
+        except (OSError, ValueError):
+            pass
+        finally:
+            with self._condition:
+                self._closed = True
+                self._condition.notify_all()
+
+    def _call(self, method, **params):
+        request_id = next(self._ids)
+        data = json.dumps(
+            {'id': request_id, 'method': method, 'params': params})
+        with self._send_lock:
+            self._socket.sendall((data + '\n').encode())
+        with self._condition:
+            while request_id not in self._responses:
+                if self._closed:
+                    raise ConnectionError("connection to the server lost")
+                self._condition.wait()
+            response = self._responses.pop(request_id)
+        error = response.get('error')
+        if error is None:
+            if 'status' in response:
+                self.status = response['status']
+            return response.get('result')
+        if error['type'] == 'MotionStoppedError':
+            raise MotionStoppedError()
+        if error['type'] == 'StirrerLockedError':
+            raise StirrerLockedError()
+        raise RemoteError(error['type'], error['message'])
+
+    def refresh_status(self):
+        self.status = self._call('status')
+        return self.status
+
+    @property
+    def current_angle(self):
+        return self.status['current_angle']
+
+    @property
+    def motor_running(self):
+        return self.status['motor_running']
+
+    @property
+    def drive_initialized(self):
+        return self.status['drive_initialized']
+
+    @property
+    def error(self):
+        return self.status['error']
+
+    @property
+    def error_message(self):
+        return self.status['error_message']
+
+    def initialize_drive(self):
+        return self._call('initialize_drive')
+
+    def stop_motor(self):
+        return self._call('stop_motor')
+
+    def run_clockwise(self):
+        return self._call('run_clockwise')
+
+    def run_anti_clockwise(self):
+        return self._call('run_anti_clockwise')
+
+    def step_clockwise_by(self, step):
+        return self._call('step_clockwise_by', step=step)
+
+    def step_anti_clockwise_by(self, step):
+        return self._call('step_anti_clockwise_by', step=step)
+
+    def goto_angle(self, angle, direction=None):
+        return self._call('goto_angle', angle=angle, direction=direction)
+
+    def set_next_angle(self, angle):
+        return self._call('set_next_angle', angle=angle)
+
+    def goto_next_angle(self):
+        return self._call('goto_next_angle')
+
+    def wait_settled(self):
+        """
+        wait until the motor stopped, returns the current angle
+        """
+        return self._call('wait_settled')
+
+    def close(self):
+        try:
+            self._socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._socket.close()
+        self._reader.join()
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(
+        description="Share a stirrer between several clients")
+    parser.add_argument('--port', default=None,
+                        help="serial device or URL, e.g. socket://host:port")
+    parser.add_argument('--listen', default='127.0.0.1:5050',
+                        help="host:port to serve on")
+    parser.add_argument('--unix', metavar='PATH',
+                        help="serve on a Unix socket instead of TCP")
+    parser.add_argument('--poll-interval', type=float, default=0.2)
+    args = parser.parse_args()
+
+    port_parameters = {}
+    if args.port is not None:
+        port_parameters['port'] = args.port
+    if args.unix:
+        address = args.unix
+    else:
+        host, port = args.listen.rsplit(':', 1)
+        address = (host, int(port))
+    stirrer = Stirrer(port_parameters)
+    server = StirrerServer(stirrer, address, args.poll_interval)
+    print(f"Serving on {server.address}")
+    try:
+        server.serve_forever()
+    finally:
+        stirrer.close()
@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+import collections
+import math
+import os
+import select
+import socket
+import threading
+import time
+
+from stirrer import Stirrer
+
+
+class _Ramp(object):
+    """
+    Trapezoidal motion over `distance` degree, starting with `v0`,
+    accelerating to at most `vmax` and ending with `vend` (degree/s).
+    A `distance` of None runs forever at `vmax`.
+    """
+
+    def __init__(self, v0, vmax, vend, acc, distance):
+        self.v0 = v0
+        self.acc = acc
+        self.distance = distance
+        if distance is not None:
+            # triangular profile if vmax can not be reached
+            vpeak = math.sqrt((2 * acc * distance + v0**2 + vend**2) / 2)
+            vmax = max(min(vmax, vpeak), v0, vend)
+        self.vmax = vmax
+        self.accel_time = (vmax - v0) / acc
+        self.accel_distance = (v0 + vmax) / 2 * self.accel_time
+        if distance is None:
+            self.duration = math.inf
+            return
+        self.decel_time = (vmax - vend) / acc
+        decel_distance = (vmax + vend) / 2 * self.decel_time
+        self.cruise_distance = max(
+            distance - self.accel_distance - decel_distance, 0)
+        self.cruise_time = self.cruise_distance / vmax if vmax else 0
+        self.duration = self.accel_time + self.cruise_time + self.decel_time
+
+    def position(self, t):
+        # (distance travelled, velocity) after t seconds
+        if t >= self.duration:
+            return self.distance, 0.0
+        if t < self.accel_time:
+            return (self.v0 * t + self.acc * t**2 / 2,
+                    self.v0 + self.acc * t)
+        t -= self.accel_time
+        if self.distance is None or t < self.cruise_time:
+            return self.accel_distance + self.vmax * t, self.vmax
+        t -= self.cruise_time
+        return (self.accel_distance + self.cruise_distance
+                + self.vmax * t - self.acc * t**2 / 2,
+                self.vmax - self.acc * t)
+
+
+class StirrerSimulator(object):
+    """
+    Emulates a STIRRER Controller V1.50 on a pseudo-terminal or a local
+    TCP socket.
+
+    Supported commands are '?', INIT, STOP, DIR:n, RMA:x, RMS, DEG:x, RMT
+    and ERREAD. Moves follow a trapezoidal profile built from
+    `stirrer_parameters`. With `time_scale` > 1 the simulated clock runs
+    faster than the wall clock, use `scaled_stirrer_parameters()` for the
+    Stirrer driving it. `response_delay` (s) and `baudrate` emulate the
+    latency of the controller and of the wire in wall-clock time.
+
+        with StirrerSimulator(time_scale=10) as sim:
+            stirrer = Stirrer(
+                sim.open_pty(),
+                stirrer_parameters=sim.scaled_stirrer_parameters())
+    """
+    read_termination = Stirrer.read_termination
+    write_termination = Stirrer.write_termination
+
+    def __init__(
+            self,
+            stirrer_parameters=None,
+            time_scale=1.0,
+            response_delay=0.0,
+            baudrate=None,
+            angle=0.0,
+            initialized=True):
+        if stirrer_parameters is None:
+            stirrer_parameters = {}
+        self.stirrer_parameters = {
+            **Stirrer.stirrer_parameters,
+            **stirrer_parameters}
+        self.time_scale = time_scale
+        self.response_delay = response_delay
+        self.baudrate = baudrate
+        self.initialized = initialized
+        self.locked = False
+        self.error_message = ""
+        self.direction = 1
+        self.stored_angle = None
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self.commands = collections.Counter()
+        self._lock = threading.Lock()
+        self._start = time.monotonic()
+        self._angle = angle % 360
+        self._ramp = None
+        self._ramp_start = None
+        self._sign = 1
+        self._homing = False
+        self._closing = threading.Event()
+        self._threads = []
+        self._files = []
+
+    def scaled_stirrer_parameters(self):
+        """
+        stirrer_parameters as seen through the wall clock
+        """
+        parameters = self.stirrer_parameters
+        return {
+            'maxspeed': parameters['maxspeed'] * self.time_scale,
+            'minspeed': parameters['minspeed'] * self.time_scale,
+            'acc': parameters['acc'] * self.time_scale**2}
+
+    def _now(self):
+        return (time.monotonic() - self._start) * self.time_scale
+
+    # motion
+
+    def _update(self, now):
+        # advance the motion to `now`, returns the current velocity
+        if self._ramp is None:
+            return 0.0
+        travelled, velocity = self._ramp.position(now - self._ramp_start)
+        angle = (self._ramp_angle + self._sign * travelled) % 360
+        if now - self._ramp_start >= self._ramp.duration:
+            self._ramp = None
+            if self._homing:
+                self._homing = False
+                self.initialized = True
+        self._angle = angle
+        return velocity
+
+    def _start_ramp(self, now, distance, v0=None, vmax=None):
+        parameters = self.stirrer_parameters
+        vmin = parameters['minspeed'] * 6
+        if v0 is None:
+            v0 = vmin
+        if vmax is None:
+            vmax = parameters['maxspeed'] * 6
+        self._ramp = _Ramp(v0, vmax, vmin, parameters['acc'], distance)
+        self._ramp_start = now
+        self._ramp_angle = self._angle
+
+    def _move_to(self, now, target):
+        if self.direction == 1:
+            distance = (target - self._angle) % 360
+        else:
+            distance = (self._angle - target) % 360
+        self._sign = 1 if self.direction == 1 else -1
+        self._start_ramp(now, distance)
+
+    @property
+    def angle(self):
+        with self._lock:
+            self._update(self._now())
+            return self._angle
+
+    @property
+    def running(self):
+        with self._lock:
+            self._update(self._now())
+            return self._ramp is not None
+
+    def lock(self):
+        """
+        answer everything with the lock message until `unlock()`
+        """
+        self.locked = True
+
+    def unlock(self):
+        self.locked = False
+
+    # protocol
+
+    def handle(self, command):
+        """
+        execute one command, returns the answer without termination
+        or None for commands without answer
+        """
+        self.commands[command.split(':')[0]] += 1
+        if self.locked:
+            return Stirrer.lock_message
+        with self._lock:
+            now = self._now()
+            velocity = self._update(now)
+            if command == '?':
+                return (f"{0 if self._ramp is not None else 1},"
+                        f"{self._angle:.1f},"
+                        f"{0 if self.initialized else 1},"
+                        f"{1 if self.error_message else 0}")
+            if command == 'ERREAD':
+                return self.error_message
+            if command == 'INIT':
+                self.error_message = ""
+                self.initialized = False
+                self._homing = True
+                self.direction = 1
+                self._move_to(now, 0)
+            elif command == 'STOP':
+                if self._ramp is not None:
+                    parameters = self.stirrer_parameters
+                    vmin = parameters['minspeed'] * 6
+                    distance = max(velocity**2 - vmin**2, 0) \
+                        / (2 * parameters['acc'])
+                    self._homing = False
+                    self._start_ramp(now, distance, v0=velocity,
+                                     vmax=velocity)
+            elif command.startswith('DIR:') and command[4:] in ('0', '1'):
+                self.direction = int(command[4:])
+            elif command.startswith('RMA:') or command == 'RMT':
+                try:
+                    if command == 'RMT':
+                        target = self.stored_angle
+                    else:
+                        target = float(command[4:])
+                    if target is None or not 0 <= target < 360:
+                        raise ValueError
+                except ValueError:
+                    self.error_message = f"Invalid target in {command}"
+                    return None
+                if not self.initialized:
+                    self.error_message = "Drive not initialized"
+                    return None
+                self._move_to(now, target)
+            elif command == 'RMS':
+                if not self.initialized:
+                    self.error_message = "Drive not initialized"
+                    return None
+                self._sign = 1 if self.direction == 1 else -1
+                self._start_ramp(now, None)
+            elif command.startswith('DEG:'):
+                try:
+                    self.stored_angle = float(command[4:]) % 360
+                except ValueError:
+                    self.error_message = f"Invalid target in {command}"
+            else:
+                self.error_message = f"Unknown command {command}"
+        return None
+
+    def _respond(self, data, send):
+        # feed received bytes to the protocol, returns the unparsed rest
+        self.bytes_received += len(data)
+        termination = self.write_termination.encode()
+        while termination in data:
+            frame, data = data.split(termination, 1)
+            try:
+                command = frame.decode().strip()
+            except UnicodeDecodeError:
+                command = ''
+            answer = self.handle(command) if command else None
+            if answer is None:
+                continue
+            answer = f"{answer}{self.read_termination}".encode()
+            delay = self.response_delay
+            if self.baudrate:
+                # 8N1: ten bits per byte
+                delay += len(answer) * 10 / self.baudrate
+            if delay:
+                time.sleep(delay)
+            send(answer)
+            self.bytes_sent += len(answer)
+        return data
+
+    # transports
+
+    def open_pty(self):
+        """
+        serve on a new pseudo-terminal, returns the port_parameters
+        for Stirrer
+        """
+        import pty
+        import tty
+        master, slave = pty.openpty()
+        tty.setraw(slave)
+        self._files += [master, slave]
+        self._serve(self._serve_fd, master)
+        return {'port': os.ttyname(slave)}
+
+    def open_tcp(self, host='127.0.0.1', port=0):
+        """
+        serve on a TCP socket, returns the port_parameters for Stirrer
+        """
+        server = socket.create_server((host, port))
+        server.settimeout(0.1)
+        self._files.append(server)
+        self._serve(self._serve_socket, server)
+        host, port = server.getsockname()[:2]
+        return {'port': f'socket://{host}:{port}'}
+
+    def _serve(self, target, *args):
+        thread = threading.Thread(target=target, args=args, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _serve_fd(self, fd):
+        rest = b''
+        while not self._closing.is_set():
+            if not select.select([fd], [], [], 0.1)[0]:
+                continue
+            try:
+                data = os.read(fd, 1024)
+            except OSError:
+                break
+            rest = self._respond(rest + data, lambda d: os.write(fd, d))
+
+    def _serve_socket(self, server):
+        while not self._closing.is_set():
+            try:
+                connection, address = server.accept()
+            except (socket.timeout, OSError):
+                continue
+            connection.settimeout(0.1)
+            rest = b''
+            with connection:
+                while not self._closing.is_set():
+                    try:
+                        data = connection.recv(1024)
+                    except socket.timeout:
+                        continue
+                    except OSError:
+                        break
+                    if not data:
+                        break
+                    rest = self._respond(rest + data, connection.sendall)
+
+    def close(self):
+        self._closing.set()
+        for thread in self._threads:
+            thread.join()
+        for file in self._files:
+            if isinstance(file, int):
+                os.close(file)
+            else:
+                file.close()
+        self._threads = []
+        self._files = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(
+        description="Simulate a STIRRER Controller V1.50")
+    parser.add_argument('--tcp', type=int, metavar='PORT',
+                        help="serve on a TCP port instead of a pty")
+    parser.add_argument('--time-scale', type=float, default=1.0)
+    parser.add_argument('--response-delay', type=float, default=0.0)
+    parser.add_argument('--baudrate', type=int, default=None)
+    parser.add_argument('--uninitialized', action='store_true')
+    args = parser.parse_args()
+    with StirrerSimulator(
+            time_scale=args.time_scale,
+            response_delay=args.response_delay,
+            baudrate=args.baudrate,
+            initialized=not args.uninitialized) as sim:
+        if args.tcp is not None:
+            print(sim.open_tcp(port=args.tcp)['port'])
+        else:
+            print(sim.open_pty()['port'])
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Recording and replay of the serial traffic of a Stirrer.
+
+    recorder = TrafficRecorder(capacity=100000)
+    stirrer = Stirrer(recorder=recorder)
+    ...
+    recorder.save('field.trace')
+
+    stirrer = Stirrer(port=ReplayTransport('field.trace', speed=10))
+"""
+import collections
+import struct
+import threading
+import time
+
+TRACE_MAGIC = b'STIRRERTRACE1\n'
+# monotonic time in s, direction (b'W' or b'R'), payload length
+_RECORD = struct.Struct('<dcH')
+
+WRITE = b'W'
+READ = b'R'
+
+
+class TrafficRecorder(object):
+    """
+    Records the frames written to and read from the port together with
+    their time.monotonic() timestamps.
+
+    The newest `capacity` frames are kept in memory (all frames for
+    capacity None). With `path` every frame is also appended to a trace
+    file as it arrives.
+    """
+
+    def __init__(self, capacity=10000, path=None):
+        self.frames = collections.deque(maxlen=capacity)
+        self._file = None
+        self._lock = threading.Lock()
+        if path is not None:
+            self._file = open(path, 'wb')
+            self._file.write(TRACE_MAGIC)
+
+    def record(self, direction, data):
+        frame = (time.monotonic(), direction, bytes(data))
+        self.frames.append(frame)
+        if self._file is not None:
+            with self._lock:
+                self._file.write(_RECORD.pack(*frame[:2], len(data)))
+                self._file.write(frame[2])
+
+    def save(self, path):
+        """
+        write the frames kept in memory to a trace file
+        """
+        with open(path, 'wb') as f:
+            f.write(TRACE_MAGIC)
+            for timestamp, direction, data in list(self.frames):
+                f.write(_RECORD.pack(timestamp, direction, len(data)))
+                f.write(data)
+
+    def close(self):
+        if self._file is not None:
+            with self._lock:
+                self._file.close()
+                self._file = None
+
+
+def load_trace(path):
+    """
+    read a trace file, returns a list of (timestamp, direction, data)
+    """
+    frames = []
+    with open(path, 'rb') as f:
+        if f.read(len(TRACE_MAGIC)) != TRACE_MAGIC:
+            raise ValueError(f"{path} is not a stirrer trace")
+        while True:
+            header = f.read(_RECORD.size)
+            if len(header) < _RECORD.size:
+                break
+            timestamp, direction, size = _RECORD.unpack(header)
+            frames.append((timestamp, direction, f.read(size)))
+    return frames
+
+
+class ReplayTransport(object):
+    """
+    Serial port stand-in that answers each write with the frames read
+    after the corresponding write of a recorded trace.
+
+    Answers become readable with their recorded delay after the write,
+    divided by `speed`; speed None delivers them immediately. Writes that
+    differ from the recording are counted in `mismatches`, the recorded
+    answers are replayed regardless.
+    """
+
+    def __init__(self, trace, speed=1.0, timeout=0.1):
+        if isinstance(trace, str):
+            trace = load_trace(trace)
+        self.speed = speed
+        self.timeout = timeout
+        self.is_open = True
+        self.mismatches = 0
+        # (written data, write timestamp, [(read timestamp, data), ...])
+        self._steps = collections.deque()
+        for timestamp, direction, data in trace:
+            if direction == WRITE:
+                self._steps.append((data, timestamp, []))
+            elif self._steps:
+                self._steps[-1][2].append((timestamp, data))
+        self._pending = collections.deque()
+        self._buffer = bytearray()
+
+    def _deliver(self):
+        # move answers that are due into the input buffer
+        now = time.monotonic()
+        while self._pending and self._pending[0][0] <= now:
+            self._buffer += self._pending.popleft()[1]
+
+    def write(self, data):
+        now = time.monotonic()
+        if not self._steps:
+            return len(data)
+        expected, written, answers = self._steps.popleft()
+        if bytes(data) != expected:
+            self.mismatches += 1
+        for timestamp, answer in answers:
+            delay = timestamp - written
+            if self.speed is None:
+                delay = 0
+            else:
+                delay /= self.speed
+            self._pending.append((now + delay, answer))
+        return len(data)
+
+    @property
+    def in_waiting(self):
+        self._deliver()
+        return len(self._buffer)
+
+    def _deadline(self):
+        if self.timeout is None:
+            return None
+        return time.monotonic() + self.timeout
+
+    def _sleep(self, deadline):
+        # wait for the next answer, False if none arrives before deadline
+        now = time.monotonic()
+        if deadline is not None and now >= deadline:
+            return False
+        wake = deadline
+        if self._pending:
+            due = self._pending[0][0]
+            wake = due if wake is None else min(wake, due)
+        if wake is None:
+            # blocking read without any answer left
+            return False
+        time.sleep(max(wake - now, 0))
+        return True
+
+    def read_until(self, expected=b'\n', size=None):
+        deadline = self._deadline()
+        while True:
+            self._deliver()
+            end = self._buffer.find(expected)
+            if end >= 0:
+                end += len(expected)
+            if size is not None and len(self._buffer) >= size:
+                end = size if end < 0 else min(end, size)
+            if end < 0 and not self._sleep(deadline):
+                end = len(self._buffer)
+            if end >= 0:
+                data = bytes(self._buffer[:end])
+                del self._buffer[:end]
+                return data
+
+    def read(self, size=1):
+        deadline = self._deadline()
+        while True:
+            self._deliver()
+            if len(self._buffer) >= size or not self._sleep(deadline):
+                data = bytes(self._buffer[:size])
+                del self._buffer[:size]
+                return data
+
+    def reset_input_buffer(self):
+        self._deliver()
+        self._buffer.clear()
+
+    def reset_output_buffer(self):
+        pass
+
+    def flush(self):
+        pass
+
+    def open(self):
+        self.is_open = True
+
+    def close(self):
+        self.is_open = False
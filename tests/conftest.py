@@ -0,0 +1,142 @@
+"""
+Tests of the driver against StirrerSimulator, no hardware needed:
+
+    python -m pytest tests
+"""
+import os
+import socket
+import sys
+import threading
+import time
+
+import pytest
+
+# the modules live in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stirrer import Stirrer  # noqa: E402
+from stirrer_sim import StirrerSimulator  # noqa: E402
+
+# fast enough for a full turn in a fraction of a second
+TIME_SCALE = 20
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not met in time"
+        time.sleep(0.005)
+
+
+@pytest.fixture
+def sim():
+    with StirrerSimulator(time_scale=TIME_SCALE) as sim:
+        yield sim
+
+
+@pytest.fixture
+def stirrer(sim):
+    stirrer = Stirrer(sim.open_tcp(),
+                      stirrer_parameters=sim.scaled_stirrer_parameters())
+    yield stirrer
+    stirrer.close()
+
+
+@pytest.fixture
+def silent_port():
+    """
+    port_parameters of a controller that accepts the connection but
+    never answers
+    """
+    server = socket.create_server(('127.0.0.1', 0))
+    connections = []
+
+    def accept():
+        while True:
+            try:
+                connections.append(server.accept()[0])
+            except OSError:
+                return
+    threading.Thread(target=accept, daemon=True).start()
+    yield {'port': f'socket://127.0.0.1:{server.getsockname()[1]}'}
+    server.close()
+    for connection in connections:
+        connection.close()
+
+
+class Relay(object):
+    """
+    TCP relay between a Stirrer and a simulator, `cut()` drops all
+    connections like an unplugged adapter, `restore()` listens again
+    on the same port
+    """
+
+    def __init__(self, target):
+        self.target = target
+        self.server = socket.create_server(('127.0.0.1', 0))
+        self.port = self.server.getsockname()[1]
+        self.connections = []
+        self._serve()
+
+    @property
+    def port_parameters(self):
+        return {'port': f'socket://127.0.0.1:{self.port}'}
+
+    def _serve(self):
+        threading.Thread(target=self._accept, args=(self.server,),
+                         daemon=True).start()
+
+    def _accept(self, server):
+        while True:
+            try:
+                client = server.accept()[0]
+            except OSError:
+                return
+            upstream = socket.create_connection(self.target)
+            self.connections += [client, upstream]
+            for source, sink in ((client, upstream), (upstream, client)):
+                threading.Thread(target=self._pipe, args=(source, sink),
+                                 daemon=True).start()
+
+    @staticmethod
+    def _pipe(source, sink):
+        try:
+            while True:
+                data = source.recv(1024)
+                if not data:
+                    break
+                sink.sendall(data)
+        except OSError:
+            pass
+        for connection in (source, sink):
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def cut(self):
+        try:
+            # wakes the blocked accept(), close() alone keeps listening
+            self.server.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.server.close()
+        for connection in self.connections:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            connection.close()
+        self.connections = []
+
+    def restore(self):
+        self.server = socket.create_server(('127.0.0.1', self.port))
+        self._serve()
+
+
+@pytest.fixture
+def relay(sim):
+    host, port = sim.open_tcp()['port'][len('socket://'):].rsplit(':', 1)
+    relay = Relay((host, int(port)))
+    yield relay
+    relay.cut()
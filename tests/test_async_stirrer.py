@@ -0,0 +1,87 @@
+import asyncio
+import time
+
+import pytest
+
+from async_stirrer import AsyncStirrer
+from stirrer import MotionStoppedError
+
+
+def run(sim, test):
+    async def main():
+        stirrer = AsyncStirrer(
+            sim.open_tcp(),
+            stirrer_parameters=sim.scaled_stirrer_parameters())
+        await stirrer.open()
+        try:
+            await test(stirrer)
+        finally:
+            await stirrer.close()
+    asyncio.run(main())
+
+
+def test_goto_angle(sim):
+    async def test(stirrer):
+        await stirrer.goto_angle(120)
+        assert await stirrer.wait_settled() == pytest.approx(120, abs=0.5)
+    run(sim, test)
+
+
+def test_late_answer_is_dropped(sim):
+    async def test(stirrer):
+        stirrer._query_timeout = 0.1
+        sim.response_delay = 0.2
+        assert await stirrer._query_frame('?') == b''
+        sim.response_delay = 0
+        # the late answer arrives meanwhile
+        await asyncio.sleep(0.2)
+        sim._angle = 123.0
+        assert (await stirrer.status())[1] == 123.0
+    run(sim, test)
+
+
+def record(sim):
+    commands = []
+    handle = sim.handle
+
+    def recorded(command):
+        commands.append(command)
+        return handle(command)
+    sim.handle = recorded
+    return commands
+
+
+def test_concurrent_moves_keep_dir_with_rma(sim):
+    commands = record(sim)
+
+    async def test(stirrer):
+        await asyncio.gather(stirrer.goto_angle(90, 1),
+                             stirrer.goto_angle(270, 0),
+                             stirrer.goto_angle(10, 1))
+        await stirrer.wait_settled()
+    run(sim, test)
+    moves = [command for command in commands if command != '?']
+    for index, command in enumerate(moves):
+        if command.startswith('DIR:'):
+            assert moves[index + 1].startswith('RMA:')
+
+
+def test_stop_between_dir_and_rma(sim):
+    commands = record(sim)
+
+    async def test(stirrer):
+        stirrer._inter_cmd_wait_time = 0.3
+
+        async def stop():
+            await asyncio.sleep(0.1)
+            started = time.monotonic()
+            assert not await stirrer.stop()
+            assert time.monotonic() - started < 1
+        results = await asyncio.gather(
+            stirrer.goto_angle(180, 1), stop(), return_exceptions=True)
+        assert isinstance(results[0], MotionStoppedError)
+        assert results[1] is None
+    run(sim, test)
+    moves = [command for command in commands if command != '?']
+    assert moves == ['DIR:1', 'STOP']
+    assert not sim.running
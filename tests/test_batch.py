@@ -0,0 +1,36 @@
+from stirrer import Stirrer
+from stirrer_trace import TrafficRecorder, WRITE
+
+from conftest import wait_for
+
+
+def test_direction_is_sent_once(stirrer, sim):
+    for angle in (30, 60, 90):
+        stirrer.goto_angle(angle, direction=1)
+    assert sim.commands['DIR'] == 1
+    assert sim.commands['RMA'] == 3
+
+
+def batch_writes(sim, inter_cmd_wait_time):
+    recorder = TrafficRecorder()
+    stirrer = Stirrer(sim.open_tcp(), recorder=recorder,
+                      stirrer_parameters=sim.scaled_stirrer_parameters())
+    stirrer._inter_cmd_wait_time = inter_cmd_wait_time
+    try:
+        recorder.frames.clear()
+        stirrer._write_batch(('DIR:0', 'RMA:10'))
+    finally:
+        stirrer.close()
+    return [frame for frame in recorder.frames if frame[1] == WRITE]
+
+
+def test_commands_keep_their_gap(sim):
+    writes = batch_writes(sim, 0.05)
+    assert [frame[2] for frame in writes] == [b'DIR:0\r', b'RMA:10\r']
+    assert writes[1][0] - writes[0][0] >= 0.05
+
+
+def test_batch_without_gap_is_one_write(sim):
+    writes = batch_writes(sim, 0)
+    assert [frame[2] for frame in writes] == [b'DIR:0\rRMA:10\r']
+    wait_for(lambda: sim.commands['RMA'] == 1)
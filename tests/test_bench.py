@@ -0,0 +1,34 @@
+import pytest
+
+from stirrer_bench import Benchmark, compare, percentile
+
+
+def test_percentile():
+    values = [5, 1, 4, 2, 3]
+    assert percentile(values, 0) == 1
+    assert percentile(values, 50) == 3
+    assert percentile(values, 100) == 5
+
+
+def test_benchmark_runs_every_operation():
+    benchmark = Benchmark(response_delay=0, time_scale=20, repeat=2,
+                          sweep_positions=4)
+    results = benchmark.run()
+    assert set(results) == {
+        '_status', 'current_angle', 'goto_angle', 'step_clockwise_by',
+        'initialize_drive', 'stop_motor', 'tuned_sweep'}
+    assert results['_status']['count'] == 2
+    # every read is a query, not a status cache hit
+    assert results['current_angle']['bytes_per_op'] > 0
+    assert results['tuned_sweep']['positions'] == 4
+    assert 'tuned_sweep' in benchmark.report()
+    assert benchmark.to_dict()['parameters']['repeat'] == 2
+
+
+def test_compare():
+    old = {'results': {'goto_angle': {'p50': 0.2}, 'gone': {'p50': 1}}}
+    new = {'results': {'goto_angle': {'p50': 0.1}, 'new': {'p50': 1}}}
+    lines = compare(old, new).splitlines()
+    assert len(lines) == 2
+    assert lines[1].split()[0] == 'goto_angle'
+    assert float(lines[1].split()[-1]) == pytest.approx(0.5)
@@ -0,0 +1,63 @@
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import pytest
+
+from stirrer_cli import load_sweeps
+from stirrer_sim import StirrerSimulator
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def write(tmp_path, definition):
+    path = tmp_path / 'sweeps.json'
+    path.write_text(json.dumps(definition))
+    return str(path)
+
+
+def test_load_sweeps(tmp_path):
+    initialize, sweeps = load_sweeps(write(tmp_path, [{'angles': [0, 90]}]))
+    assert initialize
+    assert sweeps == [{'angles': [0, 90]}]
+
+
+@pytest.mark.parametrize('sweep', [
+    {},
+    {'angles': [0], 'schedule': {'type': 'uniform', 'step': 10}},
+    {'schedule': {'type': 'spiral'}},
+    {'angles': [0], 'mode': 'fast'}])
+def test_load_sweeps_rejects(tmp_path, sweep):
+    with pytest.raises(ValueError):
+        load_sweeps(write(tmp_path, {'sweeps': [sweep]}))
+
+
+def cli(tmp_path, sim, definition):
+    return subprocess.Popen(
+        [sys.executable, 'stirrer_cli.py', write(tmp_path, definition),
+         '--port', sim.open_tcp()['port']],
+        cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+
+
+def test_run_logs_every_position(tmp_path, sim):
+    process = cli(tmp_path, sim, [{'angles': [0, 90, 180], 'dwell': 0.01}])
+    out, err = process.communicate(timeout=60)
+    assert process.returncode == 0, err
+    lines = [line for line in out.splitlines() if not line.startswith('#')]
+    assert [float(line.split('\t')[4]) for line in lines] == [0, 90, 180]
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason="needs SIGINT")
+def test_ctrl_c_during_initialization(tmp_path):
+    with StirrerSimulator(time_scale=1, angle=180, initialized=False) as sim:
+        process = cli(tmp_path, sim, [{'angles': [0]}])
+        # homing from 180 degree takes several seconds
+        time.sleep(1.5)
+        process.send_signal(signal.SIGINT)
+        out, err = process.communicate(timeout=30)
+        assert process.returncode == 130, err
+        assert 'Traceback' not in err
+        assert not sim.running
@@ -0,0 +1,53 @@
+import threading
+import time
+
+import pytest
+
+from stirrer import DwellScheduler, SteppedSweep
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        DwellScheduler(None, 1.0, mode='fast')
+
+
+def test_settled_mode_holds_each_position(stirrer):
+    scheduler = DwellScheduler(SteppedSweep(stirrer, [30, 60, 90]), 0.2)
+    assert scheduler.statistics() == {}
+    dwells = scheduler.run()
+    assert [dwell[0] for dwell in dwells] == [0, 1, 2]
+    for index, angle, planned, actual in dwells:
+        assert planned == pytest.approx(0.2)
+        assert actual == pytest.approx(0.2, abs=0.05)
+    statistics = scheduler.statistics()
+    assert statistics['positions'] == 3
+    assert statistics['dwell_min'] <= statistics['dwell_mean'] \
+        <= statistics['dwell_max']
+    assert abs(statistics['jitter_max']) < 0.05
+
+
+def test_cadence_mode_keeps_the_rate(stirrer):
+    calls = []
+    scheduler = DwellScheduler(
+        SteppedSweep(stirrer, [10, 20, 30, 40]), 0.3, mode='cadence')
+    started = time.monotonic()
+    scheduler.run(on_position=lambda *position: calls.append(position))
+    # move k starts at k * tau, the moves do not add up
+    assert time.monotonic() - started == pytest.approx(4 * 0.3, abs=0.1)
+    assert [call[0] for call in calls] == [0, 1, 2, 3]
+    for index, angle, settled in calls:
+        assert index * 0.3 < settled - started < (index + 1) * 0.3
+
+
+def test_stop_event_ends_the_run(stirrer):
+    stop = threading.Event()
+
+    def on_position(index, angle, settled):
+        if index == 0:
+            stop.set()
+    scheduler = DwellScheduler(
+        SteppedSweep(stirrer, [30, 60, 90], cycle=True), 10)
+    started = time.monotonic()
+    dwells = scheduler.run(on_position=on_position, stop_event=stop)
+    assert len(dwells) == 1
+    assert time.monotonic() - started < 10
@@ -0,0 +1,44 @@
+import pytest
+
+import stirrer_schedule
+from stirrer import Stirrer
+from stirrer_group import StirrerGroup
+from stirrer_sim import StirrerSimulator
+
+from conftest import TIME_SCALE
+
+
+@pytest.fixture
+def group():
+    with StirrerSimulator(time_scale=TIME_SCALE) as first, \
+            StirrerSimulator(time_scale=TIME_SCALE) as second:
+        group = StirrerGroup(
+            [Stirrer(sim.open_tcp(),
+                     stirrer_parameters=sim.scaled_stirrer_parameters())
+             for sim in (first, second)])
+        yield group, (first, second)
+        group.close()
+
+
+def test_goto_angles(group):
+    group, sims = group
+    angles = group.goto_angles([90, 300])
+    assert angles == [pytest.approx(90, abs=0.5), pytest.approx(300, abs=0.5)]
+
+
+def test_joint_sweep(group):
+    group, sims = group
+    schedule = stirrer_schedule.latin_hypercube(4, stirrers=2, seed=3)
+    rows = list(group.sweep(schedule))
+    assert len(rows) == 4
+    for row in rows:
+        for position in row:
+            assert position.angle == pytest.approx(position.target, abs=0.5)
+
+
+def test_failed_unit_is_left_out(group):
+    group, sims = group
+    sims[1].lock()
+    group.goto_angles([45, 45])
+    assert group.active == [0]
+    assert sims[0].angle == pytest.approx(45, abs=0.5)
@@ -0,0 +1,244 @@
+import json
+import os
+import threading
+import time
+
+import pytest
+
+pytest.importorskip('PySide6')
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PySide6 import QtCore  # noqa: E402
+from PySide6.QtCore import QSettings  # noqa: E402
+from PySide6.QtWidgets import QApplication, QMessageBox  # noqa: E402
+
+import StirrerRC  # noqa: E402
+from stirrer import Stirrer  # noqa: E402
+from stirrer_sim import StirrerSimulator  # noqa: E402
+
+from conftest import wait_for  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def app():
+    return QApplication.instance() or QApplication([])
+
+
+def process_until(app, condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not met in time"
+        app.processEvents()
+        time.sleep(0.005)
+
+
+@pytest.fixture
+def worker(app, stirrer):
+    worker = StirrerRC.StirrerWorker(stirrer, interval=20)
+    events = []
+    for name in ('connectedChanged', 'positionChanged', 'runningChanged',
+                 'initializedChanged', 'errorRaised', 'commandFinished'):
+        getattr(worker, name).connect(
+            lambda value, name=name: events.append((name, value)))
+    thread = QtCore.QThread()
+    worker.moveToThread(thread)
+    thread.started.connect(worker.start)
+    thread.start()
+    yield worker, events
+    worker.shutdown()
+    thread.wait()
+
+
+def test_worker_reports_the_state(app, worker, sim):
+    worker, events = worker
+    process_until(app, lambda: ('initializedChanged', True) in events)
+    assert ('connectedChanged', True) in events
+    assert ('positionChanged', 0.0) in events
+    sim._angle = 42.0
+    process_until(app, lambda: ('positionChanged', 42.0) in events)
+
+
+def test_commands_do_not_block_polling(app, worker, sim):
+    worker, events = worker
+    release = threading.Event()
+    worker.submit(lambda: release.wait(5), 'blocking')
+    sim._angle = 77.0
+    # polled while the command is still running
+    process_until(app, lambda: ('positionChanged', 77.0) in events)
+    assert ('commandFinished', 'blocking') not in events
+    release.set()
+    process_until(app, lambda: ('commandFinished', 'blocking') in events)
+
+
+def test_command_errors_are_reported(app, worker):
+    worker, events = worker
+
+    def fail():
+        raise ValueError("no way")
+    worker.submit(fail, 'failing')
+    process_until(app, lambda: ('commandFinished', 'failing') in events)
+    assert ('errorRaised', "no way") in events
+
+
+@pytest.fixture
+def settings(tmp_path):
+    return QSettings(str(tmp_path / 'StirrerRC.ini'),
+                     QSettings.Format.IniFormat)
+
+
+@pytest.fixture
+def make_window(app, settings, monkeypatch):
+    """
+    MainWindow factory, the stirrer of the window talks to
+    `port_parameters`
+    """
+    windows = []
+    answer = [QMessageBox.StandardButton.Yes]
+    monkeypatch.setattr(QMessageBox, 'question', lambda *args: answer[0])
+
+    def make_window(port_parameters, stirrer_parameters=None):
+        monkeypatch.setattr(
+            StirrerRC, 'Stirrer',
+            lambda **kwargs: Stirrer(port_parameters,
+                                     stirrer_parameters=stirrer_parameters,
+                                     **kwargs))
+        window = StirrerRC.MainWindow(settings, poll_interval=20)
+        windows.append(window)
+        return window
+    make_window.answer = answer
+    yield make_window
+    answer[0] = QMessageBox.StandardButton.Yes
+    for window in windows:
+        if window.worker_thread.isRunning():
+            window.close()
+
+
+def test_window_starts_without_controller(app, make_window):
+    started = time.monotonic()
+    window = make_window({'port': 'socket://127.0.0.1:1'})
+    assert time.monotonic() - started < 1
+    process_until(app, lambda: window.ui.cur_pos_label.text()
+                  == "not connected")
+    window.close()
+    assert not window.worker_thread.isRunning()
+
+
+def test_close_stops_a_running_move(app, make_window):
+    # real time, the move lasts several seconds
+    with StirrerSimulator(time_scale=1) as sim:
+        window = make_window(sim.open_tcp())
+        process_until(app, lambda: window.is_initialized)
+        window.worker.submit(lambda: window.stirrer.goto_angle(180, 1))
+        wait_for(lambda: sim.running)
+        started = time.monotonic()
+        window.close()
+        assert time.monotonic() - started < 2
+        assert not window.worker_thread.isRunning()
+        assert not sim.running
+        assert sim.angle < 170
+
+
+def test_close_can_be_cancelled(app, sim, make_window):
+    window = make_window(sim.open_tcp())
+    process_until(app, lambda: window.stirrer.connected)
+    make_window.answer[0] = QMessageBox.StandardButton.No
+    window.close()
+    assert window.worker_thread.isRunning()
+    assert window.stirrer.connected
+
+
+def open_window(make_window, sim):
+    return make_window(sim.open_tcp(), sim.scaled_stirrer_parameters())
+
+
+def test_setup_is_restored(app, sim, make_window, settings):
+    window = open_window(make_window, sim)
+    window.ui.velocity_spinBox.setValue(30)
+    window.ui.step_doubleSpinBox.setValue(7.5)
+    window.ui.tunmode_ccw_radioButton.setChecked(True)
+    window.ui.tunmode_shortest_checkBox.setChecked(False)
+    window.close()
+    window = open_window(make_window, sim)
+    assert window.ui.velocity_spinBox.value() == 30
+    assert window.ui.step_doubleSpinBox.value() == 7.5
+    assert window.ui.tunmode_ccw_radioButton.isChecked()
+    assert not window.ui.tunmode_shortest_checkBox.isChecked()
+
+
+def start_sweep(app, window, step=90, tau=0.1):
+    process_until(app, lambda: window.is_initialized
+                  and window.position is not None)
+    window.ui.step_doubleSpinBox.setValue(step)
+    window.ui.tun_mode_time_doubleSpinBox.setValue(tau)
+    window.ui.tunmode_cw_radioButton.setChecked(True)
+    window.tunmode_step_cont_clicked()
+
+
+def test_sweep_progress_is_saved(app, sim, make_window, settings):
+    window = open_window(make_window, sim)
+    start_sweep(app, window)
+    assert settings.value('sweep/angles') == '[90.0, 180.0, 270.0, 0.0]'
+    process_until(app, lambda: settings.value('sweep/index', type=int) >= 2)
+    window.stopp_clicked()
+    window.close()
+    saved = open_window(make_window, sim).saved_sweep
+    assert saved['angles'] == [90, 180, 270, 0]
+    assert saved['index'] >= 2
+    assert saved['tau'] == pytest.approx(0.1)
+
+
+def test_interrupted_sweep_is_resumed(app, sim, make_window, settings):
+    window = open_window(make_window, sim)
+    start_sweep(app, window)
+    process_until(app, lambda: settings.value('sweep/index', type=int) >= 1)
+    window.stopp_clicked()
+    window.close()
+    index = settings.value('sweep/index', type=int)
+    window = open_window(make_window, sim)
+    indices = []
+    window._sweepProgressed.connect(
+        lambda index, angle: indices.append(index))
+    # offered once the drive is initialized
+    process_until(app, lambda: indices)
+    assert indices[0] == (index + 1) % 4
+    assert window.saved_sweep is None
+
+
+def test_declined_sweep_is_forgotten(app, sim, make_window, settings):
+    window = open_window(make_window, sim)
+    start_sweep(app, window)
+    process_until(app, lambda: settings.value('sweep/index', type=int) >= 0)
+    window.stopp_clicked()
+    window.close()
+    make_window.answer[0] = QMessageBox.StandardButton.No
+    window = open_window(make_window, sim)
+    process_until(app, lambda: window.is_initialized)
+    assert window.sweep is None
+    assert settings.value('sweep/angles') is None
+
+
+def test_second_click_keeps_the_running_sweep(app, sim, make_window,
+                                              settings):
+    window = open_window(make_window, sim)
+    start_sweep(app, window)
+    sweep, stop = window.sweep, window.sweep_stop
+    window.ui.step_doubleSpinBox.setValue(45)
+    window.tunmode_step_cont_clicked()
+    assert window.sweep is sweep
+    assert window.sweep_stop is stop
+    assert settings.value('sweep/angles') == '[90.0, 180.0, 270.0, 0.0]'
+    window.stopp_clicked()
+
+
+def test_sweep_ended_by_stop_can_be_restarted(app, sim, make_window,
+                                              settings):
+    window = open_window(make_window, sim)
+    start_sweep(app, window)
+    process_until(app, lambda: settings.value('sweep/index', type=int) >= 0)
+    # not through the window, e.g. from another client
+    window.stirrer.stop_motor()
+    process_until(app, lambda: window.sweep is None)
+    start_sweep(app, window, step=120)
+    assert window.sweep is not None
+    assert len(json.loads(settings.value('sweep/angles'))) == 3
+    window.stopp_clicked()
@@ -0,0 +1,70 @@
+import pytest
+
+from stirrer_metrics import (Histogram, Metrics, prometheus_exporter,
+                             text_exporter)
+
+
+def test_histogram_buckets():
+    histogram = Histogram([0.01, 0.1, 1])
+    for value in (0.005, 0.01, 0.05, 0.5, 5):
+        histogram.observe(value)
+    # a bucket counts the values up to and including its bound
+    assert histogram.counts == [2, 1, 1, 1]
+    assert histogram.count == 5
+    assert histogram.sum == pytest.approx(5.565)
+    assert histogram.quantile(0.4) == 0.01
+    assert histogram.quantile(0.5) == 0.1
+    assert histogram.quantile(1) == float('inf')
+    assert Histogram().quantile(0.5) is None
+
+
+def test_counters_and_labels():
+    metrics = Metrics()
+    metrics.count('commands', command='RMA')
+    metrics.count('commands', 2, command='RMA')
+    metrics.count('commands', command='DIR')
+    assert metrics.counter('commands', command='RMA') == 3
+    assert metrics.counter('commands', command='DIR') == 1
+    assert metrics.counter('commands') == 0
+    metrics.observe('query_seconds', 0.02, command='?')
+    assert metrics.histogram('query_seconds', command='?').count == 1
+    assert metrics.histogram('query_seconds') is None
+    metrics.reset()
+    assert metrics.counter('commands', command='RMA') == 0
+
+
+def test_text_exporter():
+    metrics = Metrics()
+    metrics.count('reconnects')
+    metrics.observe('query_seconds', 0.004, command='?')
+    metrics.observe('query_seconds', 0.006, command='?')
+    assert metrics.export(text_exporter) == (
+        'reconnects 1\n'
+        'query_seconds{command="?"} count=2 mean=5.00ms '
+        'p50<=5ms p99<=10ms')
+
+
+def test_prometheus_exporter():
+    metrics = Metrics(buckets=[0.01, 0.1])
+    metrics.count('commands', command='RMA')
+    metrics.observe('query_seconds', 0.005)
+    metrics.observe('query_seconds', 0.05)
+    assert metrics.export(prometheus_exporter).splitlines() == [
+        '# TYPE stirrer_commands_total counter',
+        'stirrer_commands_total{command="RMA"} 1',
+        '# TYPE stirrer_query_seconds histogram',
+        'stirrer_query_seconds_bucket{le="0.01"} 1',
+        'stirrer_query_seconds_bucket{le="0.1"} 2',
+        'stirrer_query_seconds_bucket{le="+Inf"} 2',
+        'stirrer_query_seconds_sum 0.055',
+        'stirrer_query_seconds_count 2']
+
+
+def test_stirrer_is_instrumented(stirrer):
+    stirrer.metrics.reset()
+    stirrer.refresh_status()
+    stirrer.goto_angle(45)
+    metrics = stirrer.metrics
+    assert metrics.histogram('query_seconds', command='?').count >= 2
+    assert metrics.counter('commands', command='RMA') == 1
+    assert metrics.counter('commands', command='?') >= 2
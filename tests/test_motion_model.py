@@ -0,0 +1,70 @@
+import time
+
+import pytest
+
+from stirrer import Stirrer, travel_distance, travel_time
+from stirrer_sim import StirrerSimulator
+
+
+def test_travel_distance():
+    assert travel_distance(350, 10, 1) == 20
+    assert travel_distance(350, 10, 0) == 340
+    assert travel_distance(10, 10, 0) == 0
+
+
+def test_travel_time():
+    assert travel_time(0, 6, 0.18, 65) == 0.0
+    # 36 degree/s are reached after 0.54 s and 9.75 degree
+    vmin, vmax, acc = 0.18 * 6, 6 * 6, 65
+    ramp = (vmax - vmin) / acc
+    ramp_distance = (vmax + vmin) / 2 * ramp
+    assert travel_time(90, 6, 0.18, 65) == \
+        pytest.approx(2 * ramp + (90 - 2 * ramp_distance) / vmax)
+    # too short for maxspeed: accelerate to the middle, then brake
+    middle = (-vmin + (vmin**2 + acc * 10)**0.5) / acc
+    assert travel_time(10, 6, 0.18, 65) == pytest.approx(2 * middle)
+    assert travel_time(90, 6, 0.18, 65) > travel_time(45, 6, 0.18, 65)
+
+
+def test_unknown_direction_assumes_the_longer_way(stirrer):
+    assert stirrer.travel_time(0, 90) == stirrer.travel_time(0, 90, 0)
+    assert stirrer.travel_time(0, 90, 1) < stirrer.travel_time(0, 90)
+
+
+def test_goto_angle_settles(stirrer, sim):
+    stirrer.goto_angle(90)
+    assert stirrer._wait() == pytest.approx(90, abs=0.5)
+    assert not sim.running
+    stirrer.current_angle = 200
+    assert sim.angle == pytest.approx(200, abs=0.5)
+
+
+def test_wait_sleeps_until_the_predicted_arrival(stirrer, sim):
+    stirrer.goto_angle(180, direction=1)
+    queries = sim.commands['?']
+    started = time.monotonic()
+    stirrer._wait()
+    assert time.monotonic() - started == pytest.approx(
+        stirrer.travel_time(0, 180, 1), abs=0.15)
+    assert sim.commands['?'] - queries <= 3
+
+
+def test_wait_times_out_after_the_prediction():
+    # the model overrates the drive, moves last longer than predicted
+    with StirrerSimulator(time_scale=1) as sim:
+        parameters = {name: value * 20 for name, value
+                      in sim.scaled_stirrer_parameters().items()}
+        stirrer = Stirrer(sim.open_tcp(), stirrer_parameters=parameters)
+        stirrer._move_timeout_margin = 0.2
+        try:
+            stirrer.goto_angle(90, direction=1)
+            duration = stirrer.travel_time(0, 90, 1)
+            started = time.monotonic()
+            stirrer._wait()
+            assert time.monotonic() - started == pytest.approx(
+                1.5 * duration + 0.2, abs=0.15)
+            assert sim.running
+            assert stirrer.metrics.counter('wait_timeouts', wait='_wait') == 1
+        finally:
+            stirrer.stop_motor()
+            stirrer.close()
@@ -0,0 +1,28 @@
+import pytest
+
+from stirrer import FrameDecoder, parse_status
+
+
+def test_parse_status():
+    record = parse_status(b'0,123.4,0,1')
+    assert tuple(record) == (True, 123.4, True, True)
+    assert tuple(parse_status(b'xx1,0.0,1,0yy', 2, 11)) == \
+        (False, 0.0, False, False)
+
+
+@pytest.mark.parametrize('frame', [
+    b'', b'0,1', b'0,12.0,0', b'2,12.0,0,0', b'0,,0,0', b'0,1x,0,0',
+    b'0,1-2,0,0', b'0,12.0,0,0,', b'Stirrer is locked'])
+def test_parse_status_rejects(frame):
+    assert parse_status(frame) is None
+
+
+def test_frame_decoder_split_frames():
+    decoder = FrameDecoder(b' \r')
+    decoder.feed(b'1,0.0,0,0 ')
+    assert decoder.find() == -1
+    decoder.feed(b'\r0,9')
+    end = decoder.find()
+    assert decoder.pop(end) == b'1,0.0,0,0'
+    assert decoder.find() == -1
+    assert decoder.buffer == b'0,9'
@@ -0,0 +1,32 @@
+import time
+
+import pytest
+
+from stirrer import Stirrer
+
+
+def test_answer_is_read_up_to_the_termination(stirrer, sim):
+    sim.error_message = "Invalid target in RMA:400"
+    assert stirrer._query('ERREAD') == "Invalid target in RMA:400"
+    assert stirrer.error_message == "Invalid target in RMA:400"
+
+
+def test_query_gives_up_at_the_deadline(silent_port):
+    stirrer = Stirrer(silent_port, do_not_open=True)
+    stirrer._query_timeout = 0.2
+    try:
+        started = time.monotonic()
+        assert stirrer._query('?') == ''
+        assert time.monotonic() - started < 0.2 + 0.3
+    finally:
+        stirrer.close()
+
+
+def test_late_answer_is_discarded(stirrer, sim):
+    stirrer._query_timeout = 0.1
+    sim.response_delay = 0.3
+    assert stirrer._query('?') == ''
+    sim.response_delay = 0
+    time.sleep(0.3)
+    sim._angle = 55.0
+    assert stirrer.refresh_status()[1] == pytest.approx(55.0)
@@ -0,0 +1,94 @@
+import threading
+import time
+
+import pytest
+
+import stirrer_schedule
+from stirrer import Stirrer
+
+from conftest import wait_for
+
+
+def test_closed_port_is_not_reopened(stirrer):
+    stirrer.close()
+    with pytest.raises(Exception):
+        stirrer.refresh_status()
+    assert not stirrer.connected
+    assert stirrer._reconnects == 0
+    stirrer.connect()
+    assert stirrer.connected
+
+
+@pytest.fixture
+def relayed(sim, relay, monkeypatch):
+    monkeypatch.setattr(Stirrer, '_reconnect_delay', 0.05)
+    stirrer = Stirrer(relay.port_parameters,
+                      stirrer_parameters=sim.scaled_stirrer_parameters())
+    yield stirrer
+    stirrer.close()
+
+
+def test_reconnect_resumes_an_interrupted_sweep(relayed, sim, relay):
+    def drop():
+        wait_for(lambda: sim.running)
+        # the drive stopped together with the connection
+        sim.handle('STOP')
+        relay.cut()
+        time.sleep(0.3)
+        relay.restore()
+    thread = threading.Thread(target=drop)
+    thread.start()
+    positions = list(relayed.sweep(stirrer_schedule.uniform(90, start=0)))
+    thread.join()
+    assert len(positions) == 4
+    for position in positions:
+        assert position.angle == pytest.approx(position.target, abs=0.5)
+    assert relayed._reconnects == 1
+    assert relayed.metrics.counter('resumed_moves') >= 1
+
+
+def test_reconnect_does_not_repeat_init(relayed, sim, relay):
+    sim.initialized = False
+    relayed.refresh_status()
+    send = relayed._send
+
+    def lossy_send(commands):
+        # INIT reaches the drive, then the link breaks
+        written = send(commands)
+        if 'INIT' in commands and not relayed._reconnects:
+            relay.cut()
+            relay.restore()
+            raise OSError(5, 'Input/output error')
+        return written
+    relayed._send = lossy_send
+    assert relayed.initialize_drive()
+    assert sim.commands['INIT'] == 1
+    assert relayed._reconnects == 1
+
+
+def test_init_check_survives_a_bad_answer(relayed, sim, relay):
+    sim.initialized = False
+    relayed.refresh_status()
+    send = relayed._send
+    handle = sim.handle
+    garbled = []
+
+    def garble_once(command):
+        if command == '?' and not garbled:
+            garbled.append(command)
+            return 'garbage'
+        return handle(command)
+
+    def lossy_send(commands):
+        written = send(commands)
+        if 'INIT' in commands and not relayed._reconnects:
+            relay.cut()
+            relay.restore()
+            # the first answer on the new port is unusable
+            sim.handle = garble_once
+            raise OSError(5, 'Input/output error')
+        return written
+    relayed._send = lossy_send
+    assert relayed.initialize_drive()
+    assert garbled
+    assert sim.commands['INIT'] == 1
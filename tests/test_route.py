@@ -0,0 +1,61 @@
+import itertools
+import random
+
+import pytest
+
+from stirrer import (angle_deviation, plan_route, shortest_direction,
+                     travel_distance)
+
+
+def test_angle_deviation_wraps():
+    assert angle_deviation(359.8, 0) == pytest.approx(0.2)
+    assert angle_deviation(10, 350) == pytest.approx(20)
+    assert angle_deviation(90, 270) == 180
+
+
+def test_shortest_direction():
+    assert shortest_direction(10, 20) == 1
+    assert shortest_direction(10, 350) == 0
+    assert shortest_direction(0, 180, preferred=0) == 0
+
+
+def _route_distance(start, route):
+    distance = 0.0
+    for angle, direction in route:
+        distance += travel_distance(start, angle, direction)
+        start = angle
+    return distance
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_plan_route_is_shortest(seed):
+    rng = random.Random(seed)
+    start = rng.uniform(0, 360)
+    angles = [rng.uniform(0, 360) for i in range(5)]
+    route = plan_route(start, angles)
+    assert sorted(angle for angle, direction in route) == sorted(angles)
+    best = min(
+        sum(angle_deviation(a, b)
+            for a, b in zip((start,) + order, order))
+        for order in itertools.permutations(angles))
+    assert _route_distance(start, route) == pytest.approx(best)
+
+
+def test_plan_route_fixed_direction_within_one_turn():
+    route = plan_route(100, [90, 110, 300], direction=1)
+    assert route == [(110, 1), (300, 1), (90, 1)]
+    assert _route_distance(100, route) < 360
+
+
+def test_goto_angle_takes_the_shorter_way(stirrer, sim):
+    stirrer.goto_angle(350)
+    assert sim.direction == 0
+    stirrer.goto_angle(20)
+    assert sim.direction == 1
+
+
+def test_stirrer_plans_by_travel_time(stirrer):
+    route = stirrer.plan_route([350, 10, 30], start=0)
+    assert route == [(350, 0), (10, 1), (30, 1)]
+    route = stirrer.plan_route([90, 180], direction=0, start=0)
+    assert route == [(180, 0), (90, 0)]
@@ -0,0 +1,70 @@
+import time
+
+import pytest
+
+from stirrer_sampler import AngleSampler
+
+from conftest import TIME_SCALE, wait_for
+
+
+class CountingStirrer(object):
+    """
+    answers every status query with the next angle, 1 degree apart
+    """
+
+    def __init__(self, fail_after=None):
+        self.queries = 0
+        self.fail_after = fail_after
+
+    def _status(self, force=False):
+        if self.queries == self.fail_after:
+            raise OSError("port lost")
+        self.queries += 1
+        return True, float(self.queries), True, False, ""
+
+
+def test_ring_buffer_keeps_the_newest_samples():
+    sampler = AngleSampler(CountingStirrer(), capacity=4)
+    with sampler:
+        wait_for(lambda: sampler.count > 10)
+    samples = sampler.snapshot()
+    assert len(samples) == 4
+    assert samples['angle'].tolist() == \
+        list(range(sampler.count - 3, sampler.count + 1))
+    assert all(samples['running'])
+    assert samples['time'].tolist() == sorted(samples['time'])
+    assert sampler.snapshot(last=2)['angle'].tolist() == \
+        samples['angle'][2:].tolist()
+
+
+def test_iterator_counts_dropped_samples():
+    sampler = AngleSampler(CountingStirrer(), capacity=2, interval=0.01)
+    angles = []
+    with sampler:
+        for t, angle, running in sampler:
+            angles.append(angle)
+            if len(angles) == 3:
+                break
+            time.sleep(0.1)
+    assert angles[1] > angles[0] + 2
+    assert sampler.dropped > 0
+
+
+def test_sampling_error_ends_the_iteration():
+    sampler = AngleSampler(CountingStirrer(fail_after=5))
+    with sampler:
+        angles = [angle for t, angle, running in sampler]
+    assert all(angle <= 5 for angle in angles)
+    assert isinstance(sampler.error, OSError)
+
+
+def test_rpm(stirrer, sim):
+    with AngleSampler(stirrer) as sampler:
+        time.sleep(0.2)
+        assert sampler.rpm() is None
+        stirrer.run_clockwise()
+        time.sleep(0.5)
+        # maxspeed on the simulated clock
+        assert sampler.rpm(window=0.3) == pytest.approx(
+            sim.stirrer_parameters['maxspeed'] * TIME_SCALE, rel=0.05)
+        stirrer.stop_motor()
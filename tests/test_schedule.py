@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+import stirrer_schedule
+
+
+def test_wrap():
+    angles = stirrer_schedule.wrap([-10, 360, 725.2], resolution=0.5)
+    assert angles.tolist() == [350, 0, 5]
+    assert stirrer_schedule.wrap([-1e-14])[0] == 0.0
+
+
+def test_uniform():
+    angles = stirrer_schedule.uniform(30, start=350, direction=1)
+    assert len(angles) == 12
+    assert angles[0] == pytest.approx(20)
+    assert np.all((angles >= 0) & (angles < 360))
+    assert stirrer_schedule.uniform(10, start=5, direction=0,
+                                    count=2).tolist() == [355, 345]
+
+
+def test_nonuniform():
+    angles = stirrer_schedule.nonuniform([10, 20, 30], start=100)
+    assert angles.tolist() == [110, 130, 160]
+
+
+def test_random_positions_are_reproducible():
+    first = stirrer_schedule.random_positions(5, seed=7)
+    assert np.array_equal(first, stirrer_schedule.random_positions(5, seed=7))
+    assert np.all((first >= 0) & (first < 360))
+
+
+def test_stratified():
+    angles = stirrer_schedule.stratified(8, seed=2)
+    assert (angles // 45).astype(int).tolist() == list(range(8))
+
+
+def test_latin_hypercube_strata():
+    lhs = stirrer_schedule.latin_hypercube(8, stirrers=2, seed=1)
+    assert lhs.shape == (8, 2)
+    for column in lhs.T:
+        assert sorted((column // 45).astype(int)) == list(range(8))
+
+
+def test_joint():
+    grid = stirrer_schedule.joint([0, 90], [10, 20, 30])
+    assert grid.shape == (6, 2)
+    assert grid[:3].tolist() == [[0, 10], [0, 20], [0, 30]]
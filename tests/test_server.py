@@ -0,0 +1,60 @@
+import threading
+import time
+
+import pytest
+
+from stirrer import MotionStoppedError, Stirrer
+from stirrer_server import RemoteError, RemoteStirrer, StirrerServer
+from stirrer_sim import StirrerSimulator
+
+
+@pytest.fixture
+def server():
+    # real time, so a move lasts long enough to be stopped
+    with StirrerSimulator(time_scale=1) as sim:
+        stirrer = Stirrer(sim.open_tcp(),
+                          stirrer_parameters=sim.scaled_stirrer_parameters())
+        server = StirrerServer(stirrer, ('127.0.0.1', 0), poll_interval=0.1)
+        server.start()
+        yield server, sim
+        server.close()
+        stirrer.close()
+
+
+def test_remote_move_and_status(server):
+    server, sim = server
+    remote = RemoteStirrer(server.address)
+    try:
+        remote.goto_angle(10)
+        assert remote.wait_settled() == pytest.approx(10, abs=0.5)
+        assert not remote.motor_running
+        with pytest.raises(RemoteError):
+            remote._call('bogus')
+    finally:
+        remote.close()
+
+
+def test_stop_is_not_queued_behind_own_wait(server):
+    server, sim = server
+    remote = RemoteStirrer(server.address)
+    errors = []
+
+    def wait():
+        try:
+            remote.wait_settled()
+        except MotionStoppedError as e:
+            errors.append(e)
+    try:
+        remote.goto_angle(180, direction=1)
+        thread = threading.Thread(target=wait)
+        thread.start()
+        time.sleep(0.3)
+        started = time.monotonic()
+        remote.stop_motor()
+        assert time.monotonic() - started < 2
+        thread.join()
+        assert errors
+        assert not sim.running
+        assert sim.angle < 170
+    finally:
+        remote.close()
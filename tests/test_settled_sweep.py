@@ -0,0 +1,40 @@
+import time
+
+import pytest
+
+import stirrer_schedule
+
+
+def test_sweep_reaches_every_position(stirrer, sim):
+    positions = list(stirrer.sweep(stirrer_schedule.uniform(90)))
+    assert [position.index for position in positions] == [0, 1, 2, 3]
+    for position in positions:
+        assert position.angle == pytest.approx(position.target, abs=0.5)
+    # the targets are preloaded, each step is a single RMT
+    assert sim.commands['RMT'] == 4
+
+
+def test_settle_delay(stirrer):
+    previous = None
+    for position in stirrer.sweep([90, 180], settle_delay=0.2):
+        # yielded after the delay, not at the confirmation
+        assert time.monotonic() - position.settled >= 0.2
+        index, target, angle, settled = position
+        if previous is not None:
+            assert settled - previous >= 0.2
+        previous = settled
+
+
+def test_next_move_waits_for_the_loop_body(stirrer, sim):
+    for position in stirrer.sweep([90, 180]):
+        time.sleep(0.2)
+        assert not sim.running
+        assert sim.angle == pytest.approx(position.target, abs=0.5)
+
+
+def test_stop_ends_the_sweep(stirrer):
+    positions = []
+    for position in stirrer.sweep([90, 180, 270]):
+        positions.append(position)
+        stirrer.stop_motor()
+    assert len(positions) == 1
@@ -0,0 +1,90 @@
+import sys
+import time
+
+import pytest
+
+from stirrer import Stirrer, travel_time
+from stirrer_sim import StirrerSimulator
+
+from conftest import wait_for
+
+
+def test_status_answer(sim):
+    assert sim.handle('?') == '1,0.0,0,0'
+    sim.initialized = False
+    assert sim.handle('?') == '1,0.0,1,0'
+
+
+def test_move_follows_the_motion_model():
+    with StirrerSimulator(time_scale=20) as sim:
+        parameters = sim.scaled_stirrer_parameters()
+        started = time.monotonic()
+        sim.handle('RMA:90')
+        assert sim.running
+        wait_for(lambda: not sim.running)
+        expected = travel_time(90, parameters['maxspeed'],
+                               parameters['minspeed'], parameters['acc'])
+        assert time.monotonic() - started == pytest.approx(expected, abs=0.1)
+        assert sim.angle == pytest.approx(90)
+
+
+def test_direction_and_preloaded_target(sim):
+    sim.handle('DIR:0')
+    sim.handle('DEG:350')
+    sim.handle('RMT')
+    wait_for(lambda: not sim.running)
+    assert sim.angle == pytest.approx(350)
+    assert sim.commands['RMT'] == 1
+
+
+def test_stop_decelerates(sim):
+    sim.handle('RMS')
+    time.sleep(0.1)
+    sim.handle('STOP')
+    wait_for(lambda: not sim.running)
+    stopped = sim.angle
+    time.sleep(0.05)
+    assert sim.angle == stopped
+
+
+def test_init_homes_to_zero():
+    with StirrerSimulator(time_scale=20, angle=90, initialized=False) as sim:
+        assert sim.handle('RMA:10') is None
+        assert sim.handle('ERREAD') == "Drive not initialized"
+        sim.handle('INIT')
+        wait_for(lambda: not sim.running)
+        assert sim.angle == pytest.approx(0)
+        assert sim.initialized
+        assert sim.handle('ERREAD') == ""
+
+
+def test_invalid_commands_set_the_error(sim):
+    sim.handle('RMA:400')
+    assert sim.handle('?').endswith(',1')
+    assert sim.handle('ERREAD') == "Invalid target in RMA:400"
+    sim.handle('FOO')
+    assert sim.handle('ERREAD') == "Unknown command FOO"
+
+
+def test_locked(sim):
+    sim.lock()
+    assert sim.handle('?') == Stirrer.lock_message
+    sim.unlock()
+    assert sim.handle('?') == '1,0.0,0,0'
+
+
+def test_stirrer_over_tcp(stirrer, sim):
+    sim._angle = 42.0
+    assert stirrer.refresh_status()[1] == 42.0
+    assert sim.bytes_received and sim.bytes_sent
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason="needs a pty")
+def test_stirrer_over_pty(sim):
+    stirrer = Stirrer(sim.open_pty(),
+                      stirrer_parameters=sim.scaled_stirrer_parameters())
+    try:
+        stirrer.goto_angle(30)
+        assert stirrer._wait() == pytest.approx(30, abs=0.5)
+    finally:
+        stirrer.close()
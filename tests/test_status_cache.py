@@ -0,0 +1,33 @@
+import time
+
+
+def test_reads_share_one_query(stirrer, sim):
+    stirrer.refresh_status()
+    queries = sim.commands['?']
+    stirrer.current_angle
+    stirrer.motor_running
+    stirrer.drive_initialized
+    assert sim.commands['?'] == queries
+
+
+def test_snapshot_expires(stirrer, sim):
+    stirrer.status_ttl = 0.05
+    stirrer.refresh_status()
+    sim._angle = 12.0
+    assert stirrer.current_angle == 0.0
+    time.sleep(0.1)
+    assert stirrer.current_angle == 12.0
+
+
+def test_refresh_bypasses_the_cache(stirrer, sim):
+    stirrer.refresh_status()
+    sim._angle = 34.0
+    assert stirrer.refresh_status()[1] == 34.0
+
+
+def test_commands_invalidate_the_snapshot(stirrer, sim):
+    stirrer.refresh_status()
+    stirrer.run_clockwise()
+    assert stirrer.motor_running
+    stirrer.stop_motor()
+    assert not sim.running
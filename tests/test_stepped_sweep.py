@@ -0,0 +1,43 @@
+import pytest
+
+from stirrer import MotionStoppedError, SteppedSweep
+
+
+def test_each_step_is_a_single_rmt(stirrer, sim):
+    sweep = SteppedSweep(stirrer, [90, 180, 270])
+    angles = list(sweep)
+    assert angles == [pytest.approx(angle, abs=0.5)
+                      for angle in (90, 180, 270)]
+    assert sweep.finished
+    assert sim.commands['RMT'] == 3
+    # one DEG: per target, preloaded while dwelling
+    assert sim.commands['DEG'] == 3
+    assert sim.commands['RMA'] == 0
+
+
+def test_cycle_starts_over(stirrer):
+    sweep = SteppedSweep(stirrer, [90, 180], cycle=True)
+    for i in range(3):
+        sweep.advance()
+    assert sweep.index == 0
+    assert not sweep.finished
+
+
+def test_angles_are_wrapped(stirrer, sim):
+    sweep = SteppedSweep(stirrer, [370, -10])
+    assert sweep.advance() == pytest.approx(10, abs=0.5)
+    assert sweep.advance() == pytest.approx(350, abs=0.5)
+
+
+def test_stop_ends_the_sweep(stirrer):
+    sweep = SteppedSweep(stirrer, [90, 180])
+    sweep.advance()
+    stirrer.stop_motor()
+    with pytest.raises(MotionStoppedError):
+        sweep.advance()
+
+
+def test_arrival_at_zero_is_checked_wrapped(stirrer, sim):
+    sim._angle = 359.8
+    stirrer._status_time = None
+    stirrer._check_arrival(0.0)
@@ -0,0 +1,87 @@
+import threading
+import time
+
+import pytest
+
+from stirrer import DwellScheduler, MotionStoppedError, SteppedSweep, Stirrer
+
+from conftest import wait_for
+
+
+def test_stop_preempts_a_move(stirrer, sim):
+    errors = []
+
+    def move():
+        try:
+            stirrer.goto_angle(180, direction=1)
+        except MotionStoppedError as e:
+            errors.append(e)
+    thread = threading.Thread(target=move)
+    thread.start()
+    wait_for(lambda: sim.running)
+    stirrer.stop_motor()
+    thread.join()
+    assert errors
+    assert not sim.running
+    assert sim.angle < 179
+    assert stirrer.last_stop_latency < 0.5
+
+
+def test_stop_between_command_and_wait(stirrer, sim):
+    # a STOP sent after the command but before its wait started
+    wait = stirrer._wait
+
+    def late_wait(generation=None):
+        stirrer._wait = wait
+        thread = threading.Thread(target=stirrer.stop_motor)
+        thread.start()
+        thread.join()
+        return wait(generation)
+    stirrer._wait = late_wait
+    scheduler = DwellScheduler(SteppedSweep(stirrer, [180, 90]), 0.01)
+    assert scheduler.run() == []
+    stirrer._wait = late_wait
+    with pytest.raises(MotionStoppedError):
+        stirrer.current_angle = 270
+
+
+def test_status_retries_do_not_block_stop(silent_port):
+    stirrer = Stirrer(silent_port, status_retries=4, do_not_open=True)
+    stirrer._query_timeout = 0.3
+    errors = []
+
+    def step():
+        try:
+            stirrer.step_clockwise_by(10)
+        except Exception as e:
+            errors.append(e)
+    thread = threading.Thread(target=step)
+    thread.start()
+    time.sleep(0.1)
+    with pytest.raises(Exception):
+        # the wait after the STOP finds no controller either
+        stirrer.stop_motor()
+    thread.join()
+    stirrer.close()
+    assert errors
+    # a query in flight delays the STOP, the retries do not
+    assert stirrer.last_stop_latency < stirrer._query_timeout + 0.2
+
+
+def test_connect_retries_the_status(sim):
+    handle = sim.handle
+    garbled = []
+
+    def garble_once(command):
+        if command == '?' and not garbled:
+            garbled.append(command)
+            return 'garbage'
+        return handle(command)
+    sim.handle = garble_once
+    stirrer = Stirrer(sim.open_tcp(),
+                      stirrer_parameters=sim.scaled_stirrer_parameters())
+    try:
+        assert garbled
+        assert stirrer.connected
+    finally:
+        stirrer.close()
@@ -0,0 +1,79 @@
+import time
+
+import pytest
+
+from stirrer import Stirrer
+from stirrer_trace import (ReplayTransport, TrafficRecorder, load_trace,
+                           READ, WRITE)
+
+
+def record_session(sim, recorder):
+    stirrer = Stirrer(sim.open_tcp(), recorder=recorder)
+    try:
+        sim._angle = 33.0
+        stirrer.refresh_status()
+        sim.error_message = "Invalid target in RMA:400"
+        stirrer.refresh_status()
+    finally:
+        stirrer.close()
+
+
+def test_recorder_keeps_the_newest_frames():
+    recorder = TrafficRecorder(capacity=2)
+    for data in (b'?\r', b'1,0.0,0,0 \r', b'STOP\r'):
+        recorder.record(WRITE, data)
+    assert [frame[2] for frame in recorder.frames] == \
+        [b'1,0.0,0,0 \r', b'STOP\r']
+
+
+def test_save_and_load(sim, tmp_path):
+    recorder = TrafficRecorder()
+    record_session(sim, recorder)
+    path = str(tmp_path / 'session.trace')
+    recorder.save(path)
+    frames = load_trace(path)
+    assert frames == list(recorder.frames)
+    assert frames[0][1:] == (WRITE, b'?\r')
+    assert frames[1][1] == READ
+
+
+def test_streamed_trace_file(sim, tmp_path):
+    path = str(tmp_path / 'session.trace')
+    recorder = TrafficRecorder(capacity=0, path=path)
+    record_session(sim, recorder)
+    recorder.close()
+    assert not recorder.frames
+    assert [frame[2] for frame in load_trace(path)][:2] == \
+        [b'?\r', f"1,0.0,0,0{Stirrer.read_termination}".encode()]
+
+
+def test_not_a_trace(tmp_path):
+    path = tmp_path / 'other'
+    path.write_bytes(b'something else')
+    with pytest.raises(ValueError):
+        load_trace(str(path))
+
+
+def test_replay_reproduces_the_session(sim):
+    recorder = TrafficRecorder()
+    record_session(sim, recorder)
+    transport = ReplayTransport(list(recorder.frames), speed=None)
+    stirrer = Stirrer(port=transport)
+    try:
+        assert stirrer.refresh_status()[1] == 33.0
+        assert stirrer.refresh_status()[4] == "Invalid target in RMA:400"
+    finally:
+        stirrer.close()
+    assert transport.mismatches == 0
+
+
+def test_replay_keeps_the_recorded_delays(sim):
+    sim.response_delay = 0.1
+    recorder = TrafficRecorder()
+    record_session(sim, recorder)
+    transport = ReplayTransport(list(recorder.frames), speed=1, timeout=1)
+    started = time.monotonic()
+    transport.write(b'FOO\r')
+    assert transport.read_until(b'\r') == b'1,0.0,0,0 \r'
+    assert time.monotonic() - started >= 0.1
+    assert transport.mismatches == 1
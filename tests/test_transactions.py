@@ -0,0 +1,65 @@
+import threading
+
+from stirrer import (PRIORITY_COMMAND, PRIORITY_STATUS, PRIORITY_STOP,
+                     _Transactions)
+
+from conftest import wait_for
+
+
+def test_nested_transactions():
+    transactions = _Transactions()
+    assert not transactions.held()
+    with transactions:
+        with transactions.request(PRIORITY_STATUS):
+            assert transactions.held()
+        assert transactions.held()
+    assert not transactions.held()
+
+
+def test_waiting_threads_are_served_by_priority_then_fifo():
+    transactions = _Transactions()
+    served = []
+    threads = []
+
+    def request(name, priority):
+        with transactions.request(priority):
+            served.append(name)
+    transactions.acquire()
+    for name, priority in (('status', PRIORITY_STATUS),
+                           ('first', PRIORITY_COMMAND),
+                           ('second', PRIORITY_COMMAND),
+                           ('stop', PRIORITY_STOP)):
+        thread = threading.Thread(target=request, args=(name, priority))
+        thread.start()
+        threads.append(thread)
+        # queue the requests in this order
+        wait_for(lambda: len(transactions._queue) == len(threads))
+    transactions.release()
+    for thread in threads:
+        thread.join()
+    assert served == ['stop', 'first', 'second', 'status']
+
+
+def test_direction_stays_with_its_move(stirrer, sim):
+    commands = []
+    handle = sim.handle
+
+    def record(command):
+        commands.append(command)
+        return handle(command)
+    sim.handle = record
+
+    def move(angle, direction):
+        for i in range(3):
+            stirrer.goto_angle(angle, direction=direction)
+    threads = [threading.Thread(target=move, args=args)
+               for args in ((90, 1), (270, 0))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    moves = [command for command in commands if command != '?']
+    assert moves.count('DIR:0') + moves.count('DIR:1') >= 2
+    for index, command in enumerate(moves):
+        if command.startswith('DIR:'):
+            assert moves[index + 1].startswith('RMA:')